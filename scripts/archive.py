@@ -0,0 +1,295 @@
+"""
+This script keeps every webpage scraped from ESPN CricInfo in a single indexed
+SQLite file with zlib compressed HTML, so that a page can be looked up by URL
+without re-reading the whole archive.
+
+In 'fragment' mode, only the DOM fragments the extractors read are archived
+(see fragments.py), each distinct fragment stored once however many URLs share it.
+Fragments cut by an older FRAGMENT_VERSION are cut again from the whole webpage
+when it is archived, and scraped again otherwise.
+
+Usage: python scripts/archive.py (one-shot migration of the CSV archives)
+       python scripts/archive.py --fragments --drop-pages (cutting every archived webpage down to its fragments)
+"""
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import threading
+import zlib
+import pandas as pd
+
+from fragments import page_fragment, FRAGMENT_VERSION
+
+ARCHIVE_PATH = '../data/archive/archive.db'
+CSV_ARCHIVES = ['../data/archive/archive-players.csv',
+                '../data/archive/archive-grounds.csv',
+                '../data/archive/archive-matches.csv']
+
+ARCHIVE_MODES = ['page', 'fragment']
+
+# One connection per archive file for the lifetime of the process, shared by scraping threads
+_connections = {}
+_lock = threading.RLock()
+_settings = {'mode': 'page', 'path': ARCHIVE_PATH}
+
+def set_archive_mode(mode):
+    """
+    Choose what is archived from now on: whole webpages ('page') or only the fragments the extractors read ('fragment')
+    """
+    if mode not in ARCHIVE_MODES:
+        raise ValueError('Unknown archive mode ' + str(mode) + ', expected one of ' + str(ARCHIVE_MODES))
+    _settings['mode'] = mode
+
+def set_archive_path(path=ARCHIVE_PATH):
+    """
+    Choose the archive webpages are looked up in and saved to from now on, e.g. a scratch archive for a load test
+    """
+    _settings['path'] = path
+
+def page_kind(url):
+    """
+    Given a URL, return the kind of webpage it points to, mirroring how the CSV archives were distributed
+
+    Keywords:
+        url: (str) url of webpage
+
+    Return
+        kind: (str) 'player', 'ground' or 'match'
+    """
+
+    if 'player' in url:
+        return 'player'
+    elif 'ground' in url:
+        return 'ground'
+    else:
+        return 'match'
+
+def open_archive(path=None):
+    """
+    Open the page store once per process, creating it and migrating the CSV archives on first use.
+
+    Keywords:
+        path: (str) location of the SQLite archive, by default the one chosen with set_archive_path
+
+    Return
+        connection: (sqlite3.Connection) open connection to the page store
+    """
+
+    path = _settings['path'] if path is None else path
+    with _lock:
+        if path in _connections:
+            return _connections[path]
+
+        new = not os.path.exists(path)
+        connection = sqlite3.connect(path, check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute('CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, kind TEXT, html BLOB)')
+        connection.execute('CREATE TABLE IF NOT EXISTS fragments (hash TEXT PRIMARY KEY, html BLOB)')
+        connection.execute('CREATE TABLE IF NOT EXISTS fragment_pages (url TEXT PRIMARY KEY, kind TEXT, version INTEGER, hash TEXT)')
+        connection.commit()
+        _connections[path] = connection
+
+        if new:
+            migrate_csv_archives(connection)
+
+        return connection
+
+def migrate_csv_archives(connection, files=CSV_ARCHIVES):
+    """
+    Copy the webpages of the legacy CSV archives into the page store. Existing URLs are left untouched.
+
+    Keywords:
+        connection: (sqlite3.Connection) open connection to the page store
+        files: (list) CSV archives with url and html columns
+
+    Return
+        migrated: (int) number of webpages copied
+    """
+
+    migrated = 0
+    for file in files:
+        if not os.path.exists(file):
+            continue
+        # Reading in chunks keeps the migration from loading a whole archive in memory
+        for chunk in pd.read_csv(file, chunksize=500):
+            rows = [(url, page_kind(url), zlib.compress(str(html).encode('utf-8')))
+                    for url, html in zip(chunk['url'], chunk['html'])]
+            with _lock, connection:
+                connection.executemany('INSERT OR IGNORE INTO pages VALUES (?, ?, ?)', rows)
+            migrated += len(rows)
+
+    return migrated
+
+def archive_get(url, path=None):
+    """
+    Given a URL, return the archived HTML of the webpage if it has been scraped before.
+
+    Keywords:
+        url: (str) url of webpage
+        path: (str) location of the SQLite archive
+
+    Return
+        html: (str) archived HTML, or None when the webpage is not archived
+    """
+
+    if _settings['mode'] == 'fragment':
+        return fragment_get(url, path)
+
+    connection = open_archive(path)
+    with _lock:
+        row = connection.execute('SELECT html FROM pages WHERE url = ?', (url,)).fetchone()
+    if row is None:
+        return None
+    return zlib.decompress(row[0]).decode('utf-8')
+
+def archive_put(url, html, path=None):
+    """
+    Archive the HTML of a scraped webpage for future use.
+
+    Keywords:
+        url: (str) url of webpage
+        html: (str) HTML of the webpage
+        path: (str) location of the SQLite archive
+    """
+
+    if _settings['mode'] == 'fragment':
+        fragment_put(url, page_fragment(url, str(html)), path)
+        return
+
+    html = zlib.compress(str(html).encode('utf-8'))
+    connection = open_archive(path)
+    with _lock, connection:
+        connection.execute('INSERT OR REPLACE INTO pages VALUES (?, ?, ?)',
+                           (url, page_kind(url), html))
+
+def fragment_get(url, path=None):
+    """
+    Given a URL, return the archived fragments of the webpage. Fragments of an older version are cut
+    again from the whole webpage when it is archived.
+
+    Keywords:
+        url: (str) url of webpage
+        path: (str) location of the SQLite archive
+
+    Return
+        html: (str) archived fragments, or None when the webpage has to be scraped
+    """
+
+    connection = open_archive(path)
+    with _lock:
+        row = connection.execute('SELECT fragments.html FROM fragment_pages JOIN fragments USING (hash) '
+                                 'WHERE url = ? AND version = ?', (url, FRAGMENT_VERSION)).fetchone()
+        page = None
+        if row is None:
+            page = connection.execute('SELECT html FROM pages WHERE url = ?', (url,)).fetchone()
+    if row is not None:
+        return zlib.decompress(row[0]).decode('utf-8')
+    if page is None:
+        return None
+
+    fragment = page_fragment(url, zlib.decompress(page[0]).decode('utf-8'))
+    fragment_put(url, fragment, path)
+    return fragment
+
+def fragment_put(url, fragment, path=None):
+    """
+    Archive the fragments of a webpage, storing identical fragments only once.
+
+    Keywords:
+        url: (str) url of webpage
+        fragment: (str) fragments of the webpage, see fragments.page_fragment
+        path: (str) location of the SQLite archive
+    """
+
+    data = fragment.encode('utf-8')
+    digest = hashlib.sha1(data).hexdigest()
+    connection = open_archive(path)
+    with _lock, connection:
+        connection.execute('INSERT OR IGNORE INTO fragments VALUES (?, ?)', (digest, zlib.compress(data, 9)))
+        connection.execute('INSERT OR REPLACE INTO fragment_pages VALUES (?, ?, ?, ?)',
+                           (url, page_kind(url), FRAGMENT_VERSION, digest))
+
+def archive_urls(kind=None, path=None):
+    """
+    List the URLs of the archived webpages.
+
+    Keywords:
+        kind: (str) only list webpages of this kind ('player', 'ground' or 'match'), all of them when None
+        path: (str) location of the SQLite archive
+
+    Return
+        urls: (list) urls of archived webpages
+    """
+
+    # In fragment mode, whole webpages are listed too as they can be cut into fragments
+    query = 'SELECT url, kind FROM pages'
+    if _settings['mode'] == 'fragment':
+        query = 'SELECT url, kind FROM pages UNION SELECT url, kind FROM fragment_pages'
+
+    connection = open_archive(path)
+    with _lock:
+        if kind is None:
+            rows = connection.execute('SELECT url FROM (' + query + ')').fetchall()
+        else:
+            rows = connection.execute('SELECT url FROM (' + query + ') WHERE kind = ?', (kind,)).fetchall()
+    return [row[0] for row in rows]
+
+def archive_size(path=None):
+    """
+    Measure the archive: number of entries and compressed bytes of whole webpages, fragmented webpages and distinct fragments
+
+    Return
+        size: (dict) counts and bytes per table
+    """
+
+    connection = open_archive(path)
+    with _lock:
+        pages = connection.execute('SELECT COUNT(*), COALESCE(SUM(LENGTH(html)), 0) FROM pages').fetchone()
+        fragments = connection.execute('SELECT COUNT(*), COALESCE(SUM(LENGTH(html)), 0) FROM fragments').fetchone()
+        fragment_pages = connection.execute('SELECT COUNT(*) FROM fragment_pages').fetchone()
+    return {'pages': pages[0], 'page_bytes': pages[1], 'fragment_pages': fragment_pages[0],
+            'fragments': fragments[0], 'fragment_bytes': fragments[1]}
+
+def compact_archive(path=None, drop_pages=False):
+    """
+    Cut every archived webpage down to its fragments, optionally dropping the whole webpages afterwards,
+    then reclaim the space of fragments no longer used by any URL.
+
+    Keywords:
+        path: (str) location of the SQLite archive
+        drop_pages: (bool) deleting the whole webpages once they are cut into fragments
+
+    Return
+        size: (dict) size of the archive afterwards, see archive_size
+    """
+
+    connection = open_archive(path)
+    with _lock:
+        urls = [row[0] for row in connection.execute('SELECT url FROM pages').fetchall()]
+    for url in urls:
+        with _lock:
+            row = connection.execute('SELECT html FROM pages WHERE url = ?', (url,)).fetchone()
+        fragment_put(url, page_fragment(url, zlib.decompress(row[0]).decode('utf-8')), path)
+
+    with _lock:
+        with connection:
+            if drop_pages == True:
+                connection.execute('DELETE FROM pages')
+            connection.execute('DELETE FROM fragments WHERE hash NOT IN (SELECT hash FROM fragment_pages)')
+        connection.execute('VACUUM')
+    return archive_size(path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--fragments', action='store_true', help='cut every archived webpage down to the fragments the extractors read')
+    parser.add_argument('--drop-pages', action='store_true', help='delete the whole webpages once cut into fragments')
+    args = parser.parse_args()
+
+    if args.fragments:
+        print('Before:', archive_size())
+        print('After: ', compact_archive(drop_pages=args.drop_pages))
+    else:
+        print('Migrated', migrate_csv_archives(open_archive()), 'webpages to', ARCHIVE_PATH)
@@ -0,0 +1,142 @@
+"""
+This script builds point-in-time batting and bowling statistics from the figures of every scraped
+scorecard, so that each match only sees what its players had done before it was played, rather
+than the career statistics of their webpage as scraped today.
+
+Each player's runs, balls, dismissals and wickets are accumulated in date order into a single sorted
+array, keyed by player and day, so the statistics of any player on any date are one binary search away,
+and the statistics of every player of every match are looked up in one vectorized pass.
+
+Dependencies: numpy and pandas
+"""
+
+import numpy as np
+import pandas as pd
+
+STATS = ['bat_ave', 'bat_sr', 'bowl_ave', 'bowl_econ', 'bowl_sr']
+TOTALS = ['bat_runs', 'bat_balls', 'bat_outs', 'bowl_runs', 'bowl_balls', 'bowl_wickets']
+
+# Days are counted from EPOCH, and keys of successive players are DAYS apart
+EPOCH = np.datetime64('1900-01-01', 'D')
+DAYS = 1 << 20
+
+def player_match_stats_dataframe(match_ids, match_dates, scorecards):
+    """
+    Given the figures of scorecards, tabulate the totals of every player in every match
+
+    Keywords:
+        match_ids: (list) row label of every match
+        match_dates: (list) date of every match
+        scorecards: (list) figures of every scorecard, as returned by scrapper.get_scorecard_stats
+
+    Return
+        player_match_stats: (pandas.Dataframe) match_id, match_date, url and TOTALS, one row per player per match
+    """
+    rows = []
+    for match_id, match_date, stats in zip(match_ids, match_dates, scorecards):
+        for url, role, runs, balls, count in stats:
+            if role == 'bat':
+                rows.append([match_id, match_date, url, runs, balls, count, None, None, None])
+            else:
+                rows.append([match_id, match_date, url, None, None, None, runs, balls, count])
+
+    player_match_stats = pd.DataFrame(rows, columns=['match_id', 'match_date', 'url'] + TOTALS)
+    player_match_stats[TOTALS] = player_match_stats[TOTALS].astype(float)
+    player_match_stats['match_date'] = pd.to_datetime(player_match_stats['match_date'])
+    # A player bats and bowls in the same match, and the figures of both are kept on one row
+    player_match_stats = player_match_stats.groupby(['match_id', 'match_date', 'url'], sort=False)[TOTALS].sum(min_count=1)
+
+    return player_match_stats.reset_index()
+
+def day_numbers(dates):
+    """
+    Given dates, return the number of days since EPOCH of each
+    """
+    return (pd.to_datetime(pd.Series(dates)).to_numpy().astype('datetime64[D]') - EPOCH).astype(np.int64)
+
+class AsOfStatsIndex:
+    """
+    Cumulative figures of every player in date order, answering what a player's statistics were before a date
+
+    Keywords:
+        player_match_stats: (pandas.Dataframe) url, match_date and TOTALS of every player in every match,
+                            see player_match_stats_dataframe
+    """
+
+    def __init__(self, player_match_stats):
+        codes, urls = pd.factorize(player_match_stats['url'])
+        self.players = pd.Index(urls)
+        days = day_numbers(player_match_stats['match_date'])
+
+        order = np.lexsort((days, codes))
+        codes = codes[order]
+        # One sorted key per row: rows of a player are contiguous and in date order
+        self.keys = codes.astype(np.int64) * DAYS + days[order]
+        totals = player_match_stats[TOTALS].to_numpy(dtype=float)[order]
+        self.cumulative = np.vstack([np.zeros((1, len(TOTALS))), np.nancumsum(totals, axis=0)])
+        self.first = np.searchsorted(codes, np.arange(len(self.players)))
+
+    def totals(self, urls, dates):
+        """
+        Given players and dates, sum the figures of every match each player played strictly before the date
+
+        Keywords:
+            urls: (list) player URLs, unknown or missing players have no figures
+            dates: (list) date of each lookup
+
+        Return
+            totals: (numpy.ndarray) len(urls) x len(TOTALS) array
+        """
+        codes = self.players.get_indexer(pd.Series(urls).to_numpy(dtype=object))
+        known = codes >= 0
+        codes = np.where(known, codes, 0)
+
+        # Matches played on the day itself are left out, only earlier ones are known before the match
+        end = np.searchsorted(self.keys, codes.astype(np.int64) * DAYS + day_numbers(dates), side='left')
+        start = self.first[codes] if len(self.first) > 0 else end
+        totals = self.cumulative[end] - self.cumulative[start]
+        totals[~known] = 0
+
+        return totals
+
+    def stats(self, urls, dates):
+        """
+        Given players and dates, get the batting and bowling statistics of each player before the date
+
+        Keywords:
+            urls: (list) player URLs
+            dates: (list) date of each lookup
+
+        Return
+            stats: (pandas.Dataframe) STATS of every lookup, missing when the player had not batted, bowled or been out yet
+        """
+        totals = pd.DataFrame(self.totals(urls, dates), columns=TOTALS)
+        totals = totals.where(totals > 0)
+
+        return pd.DataFrame({'bat_ave': totals['bat_runs'] / totals['bat_outs'],
+                             'bat_sr': 100 * totals['bat_runs'] / totals['bat_balls'],
+                             'bowl_ave': totals['bowl_runs'] / totals['bowl_wickets'],
+                             'bowl_econ': 6 * totals['bowl_runs'] / totals['bowl_balls'],
+                             'bowl_sr': totals['bowl_balls'] / totals['bowl_wickets']})
+
+    def player_details(self, matches_scorecard, url=lambda link: link):
+        """
+        Given the matches scorecard, get the statistics of every player slot of every match as of the match date
+
+        Keywords:
+            matches_scorecard: (pandas.Dataframe) matches with match_date and the 24 player URL columns
+            url: (function) turning a player URL of the scorecard into the URL of the index, e.g. data.player_url
+
+        Return
+            player_details: (pandas.Dataframe) team_<t>_player_<p>_<stat> columns, with the index of matches_scorecard
+        """
+        slots = ['team_' + str(team) + '_player_' + str(player) for team in range(1,3) for player in range(1,13)]
+        links = np.concatenate([matches_scorecard[slot + '_url'].map(url).to_numpy(dtype=object) for slot in slots])
+        dates = np.tile(pd.to_datetime(matches_scorecard['match_date']).to_numpy(), len(slots))
+
+        stats = self.stats(links, dates).to_numpy().reshape(len(slots), len(matches_scorecard), len(STATS))
+        # Slot major to match major, then one column per slot and statistic
+        stats = stats.transpose(1, 0, 2).reshape(len(matches_scorecard), len(slots) * len(STATS))
+        columns = [slot + '_' + stat for slot in slots for stat in STATS]
+
+        return pd.DataFrame(stats, columns=columns, index=matches_scorecard.index)
@@ -0,0 +1,77 @@
+"""
+This script compares the two archive modes on a copy of the archive: whole webpages ('page') against
+only the fragments the extractors read ('fragment'). It checks that both give the same details, then
+reports the archived bytes and the time to look up and parse every webpage.
+
+Usage: python benchmarks/bench_archive.py [repeat] (from the scripts directory)
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from archive import (archive_get, archive_urls, compact_archive, open_archive, set_archive_mode,
+                     ARCHIVE_PATH, ARCHIVE_MODES)
+from extractors import BACKENDS
+from fragments import page_type
+from bench_extractors import extract_or_error, same
+
+def lookup_and_parse(urls, path, backend):
+    """
+    Look up every webpage in the archive and extract its details, as get_webpages and data.py would
+    """
+    for url in urls:
+        extract_or_error(page_type(url), archive_get(url, path), backend)
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    # Working on a copy, so that the archive itself is left as it is
+    path = os.path.join(tempfile.mkdtemp(), 'archive.db')
+    if os.path.exists(ARCHIVE_PATH):
+        shutil.copy(ARCHIVE_PATH, path)
+    open_archive(path)
+    urls = [url for url in archive_urls(path=path) if page_type(url) is not None]
+
+    set_archive_mode('page')
+    pages = {url: archive_get(url, path) for url in urls}
+    size = compact_archive(path)
+    set_archive_mode('fragment')
+
+    mismatches = 0
+    for url in urls:
+        fragment = archive_get(url, path)
+        for backend in BACKENDS:
+            expected = extract_or_error(page_type(url), pages[url], backend)
+            actual = extract_or_error(page_type(url), fragment, backend)
+            ok = expected == actual if isinstance(expected, str) or isinstance(actual, str) else same(expected, actual)
+            if not ok:
+                mismatches += 1
+                print('Mismatch on', url, 'with', backend)
+    print('Golden check:', len(urls), 'pages,', mismatches, 'mismatches')
+    print('Archived bytes: {:,} as pages, {:,} as fragments ({:.1f}x smaller)'.format(
+        size['page_bytes'], size['fragment_bytes'], size['page_bytes'] / max(size['fragment_bytes'], 1)))
+
+    print('{:<10}'.format('Backend') + ''.join('{:>18}'.format(mode + ' pages/s') for mode in ARCHIVE_MODES) + '{:>10}'.format('Speedup'))
+    for backend in BACKENDS:
+        rates = []
+        for mode in ARCHIVE_MODES:
+            set_archive_mode(mode)
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                lookup_and_parse(urls, path, backend)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            rates.append(len(urls) / best)
+        print('{:<10}'.format(backend) + ''.join('{:>18,.1f}'.format(rate) for rate in rates) + '{:>10.2f}'.format(rates[-1] / rates[0]))
+
+    if mismatches > 0:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
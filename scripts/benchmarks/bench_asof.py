@@ -0,0 +1,96 @@
+"""
+This script benchmarks the point-in-time player statistics of asof.py. Random batting and bowling figures
+are drawn for every player of random rosters of every match in match_results.csv, then the statistics of
+every player slot of every match are looked up as of the match date and checked against a plain loop
+over the earlier matches of a sample of players.
+
+Usage: python benchmarks/bench_asof.py [sample] (from the scripts directory)
+"""
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from asof import AsOfStatsIndex, STATS, TOTALS
+from bench_enrichment import synthetic_scorecard, best_time
+
+def synthetic_player_match_stats(matches_scorecard, seed=0):
+    """
+    Given a matches scorecard, draw the figures of every player in every match
+
+    Return
+        player_match_stats: (pandas.Dataframe) as returned by asof.player_match_stats_dataframe
+    """
+    rng = np.random.RandomState(seed)
+    columns = ['team_' + str(team) + '_player_' + str(player) + '_url' for team in range(1,3) for player in range(1,13)]
+    stats = matches_scorecard[['match_date'] + columns].melt(id_vars='match_date', value_name='url', ignore_index=False)
+    stats = stats.dropna(subset=['url']).rename_axis('match_id').reset_index()[['match_id', 'match_date', 'url']]
+    stats['match_date'] = pd.to_datetime(stats['match_date'])
+
+    rows = len(stats)
+    bats = rng.rand(rows) < 0.8
+    bowls = rng.rand(rows) < 0.4
+    stats['bat_runs'] = np.where(bats, rng.randint(0, 120, rows), np.nan)
+    stats['bat_balls'] = np.where(bats, rng.randint(1, 130, rows), np.nan)
+    stats['bat_outs'] = np.where(bats, rng.rand(rows) < 0.85, np.nan)
+    stats['bowl_runs'] = np.where(bowls, rng.randint(10, 80, rows), np.nan)
+    stats['bowl_balls'] = np.where(bowls, rng.randint(6, 61, rows), np.nan)
+    stats['bowl_wickets'] = np.where(bowls, rng.randint(0, 5, rows), np.nan)
+
+    return stats
+
+def naive_stats(player_match_stats, url, date):
+    """
+    Statistics of a player before a date, summing their earlier matches one at a time
+    """
+    totals = dict.fromkeys(TOTALS, 0.0)
+    for _, row in player_match_stats[player_match_stats['url'] == url].iterrows():
+        if row['match_date'] < date:
+            for total in TOTALS:
+                totals[total] += 0.0 if pd.isna(row[total]) else row[total]
+
+    ratio = lambda numerator, denominator: numerator / denominator if numerator > 0 and denominator > 0 else np.nan
+    return [ratio(totals['bat_runs'], totals['bat_outs']), ratio(100 * totals['bat_runs'], totals['bat_balls']),
+            ratio(totals['bowl_runs'], totals['bowl_wickets']), ratio(6 * totals['bowl_runs'], totals['bowl_balls']),
+            ratio(totals['bowl_balls'], totals['bowl_wickets'])]
+
+def main():
+    sample = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    matches = pd.read_csv('../data/match_results.csv')
+    players = pd.read_csv('../data/complete_player_details.csv')
+    matches_scorecard = synthetic_scorecard(matches, players)
+    player_match_stats = synthetic_player_match_stats(matches_scorecard)
+
+    build_time, index = best_time(lambda: AsOfStatsIndex(player_match_stats))
+    lookup_time, player_details = best_time(lambda: index.player_details(matches_scorecard))
+
+    # Golden check on a sample of player slots against the plain loop
+    rng = np.random.RandomState(1)
+    mismatches = 0
+    match_date = pd.to_datetime(matches_scorecard['match_date'])
+    for _ in range(sample):
+        match = rng.randint(len(matches_scorecard))
+        slot = 'team_' + str(rng.randint(1, 3)) + '_player_' + str(rng.randint(1, 10))
+        url = matches_scorecard[slot + '_url'].iloc[match]
+        expected = naive_stats(player_match_stats, url, match_date.iloc[match])
+        actual = player_details[[slot + '_' + stat for stat in STATS]].iloc[match].to_numpy(dtype=float)
+        if not np.allclose(expected, actual, equal_nan=True):
+            mismatches += 1
+            print('Mismatch on', url, 'before', match_date.iloc[match].date())
+    print('Golden check:', sample, 'lookups,', mismatches, 'mismatches')
+
+    lookups = len(matches_scorecard) * 24
+    print('Player matches:', len(player_match_stats), '- matches:', len(matches_scorecard))
+    print('{:<24}{:>10}{:>16}'.format('Step', 'Seconds', 'Rows/sec'))
+    print('{:<24}{:>10.3f}{:>16,.0f}'.format('build index', build_time, len(player_match_stats) / build_time))
+    print('{:<24}{:>10.3f}{:>16,.0f}'.format('lookup every slot', lookup_time, lookups / lookup_time))
+
+    if mismatches > 0:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+This script benchmarks the Elo ratings of elo.py on match_results.csv: the time to rebuild the rating
+history of every team from scratch, the time to add a year of results to existing ratings, and how well
+the ratings before each match predicted its winner.
+
+Usage: python benchmarks/bench_elo.py [repeat] (from the scripts directory)
+"""
+
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from elo import EloRatings, margin_wickets
+from storage import read_table
+from bench_enrichment import best_time
+
+def incremental(matches, latest):
+    """
+    Rate all matches but the latest at once, then each of the latest in turn, as new results would come in
+    """
+    elo = EloRatings()
+    matches = matches.iloc[np.argsort(pd.to_datetime(matches['match_date']).to_numpy(), kind='stable')]
+    elo.update_results(matches.iloc[:-latest])
+    start = time.perf_counter()
+    for i in range(len(matches) - latest, len(matches)):
+        elo.update_results(matches.iloc[i:i+1])
+    return elo, (time.perf_counter() - start) / latest
+
+def predictions(matches):
+    """
+    Chances of team_1 winning every decided match, from the ratings just before it
+    """
+    elo = EloRatings()
+    matches = matches.assign(match_date=pd.to_datetime(matches['match_date'])).sort_values('match_date', kind='mergesort')
+    margins = margin_wickets(matches['margin'])
+    chances = []
+    for match, margin in zip(matches.itertuples(), margins):
+        chances.append(elo.predict(match.team_1, match.team_2, match.ground))
+        elo.update(match.team_1, match.team_2, match.winner, margin, match.ground, np.datetime64(match.match_date, 'ns'))
+
+    return matches.assign(chances=chances)
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    matches = read_table('match_results', typed=False)
+
+    rebuild_time, elo = best_time(lambda: (lambda elo: (elo.update_results(matches), elo)[1])(EloRatings()), repeat)
+    updated, result_time = incremental(matches, 100)
+    assert updated.ratings == elo.ratings
+
+    print('Matches:', elo.matches, '- teams:', len(elo.ratings), '- home grounds:',
+          sum(home is not None for home in elo.homes.values()), 'of', len(elo.homes))
+    print('{:<36}{:>12}'.format('Step', 'ms'))
+    print('{:<36}{:>12.1f}'.format('rebuild 1971-2019', rebuild_time * 1000))
+    print('{:<36}{:>12.1f}'.format('add a new result', result_time * 1000))
+
+    # Accuracy and Brier score of the pre-match favourite, against a coin toss, from 1990 once ratings have settled
+    rated = predictions(matches)
+    decided = (rated['winner'] == rated['team_1']) | (rated['winner'] == rated['team_2'])
+    rated = rated[decided & (rated['match_date'].dt.year >= 1990)]
+    won = (rated['winner'] == rated['team_1']).astype(float)
+    print('Matches predicted since 1990:', len(rated))
+    print('Favourite won: {:.3f}'.format(((rated['chances'] > 0.5) == (won == 1)).mean()))
+    print('Brier score: {:.4f} (coin toss 0.25)'.format(((rated['chances'] - won) ** 2).mean()))
+
+if __name__ == "__main__":
+    main()
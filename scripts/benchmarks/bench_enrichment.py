@@ -0,0 +1,104 @@
+"""
+This script benchmarks the player-enrichment stage of data.py, comparing the wide implementation
+(complete_scraped_dataframe) against the long-format one (complete_scraped_long_dataframe).
+
+Rosters are drawn at random for every match in match_results.csv from the players in
+complete_player_details.csv, so that no webpage has to be scraped or parsed.
+
+Usage: python benchmarks/bench_enrichment.py (from the scripts directory)
+"""
+
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data import complete_scraped_dataframe, complete_scraped_long_dataframe
+
+def synthetic_scorecard(matches, players, seed=0):
+    """
+    Given match results and compiled player details, build a matches scorecard with random rosters
+
+    Keywords:
+        matches: (pandas.Dataframe) High-level summary of ODI matches
+        players: (pandas.Dataframe) Compiled table of each ODI teams' players
+        seed: (int) seed of the random rosters
+
+    Return
+        matches_scorecard: (pandas.Dataframe) matches with team, player name and URL columns as in extent_scorecard_dataframe
+    """
+    rng = np.random.RandomState(seed)
+    squads = {team: group for team, group in players.groupby('team')}
+
+    matches_scorecard = matches.rename(columns={'team_1':'team1', 'team_2':'team2'})
+    for team in range(1,3):
+        names = matches_scorecard['team' + str(team)]
+        matches_scorecard['team_' + str(team)] = names
+        rosters = []
+        for name in names:
+            squad = squads.get(name, players)
+            size = min(len(squad), rng.randint(9, 13))
+            roster = squad.iloc[rng.choice(len(squad), size, replace=False)]
+            rosters.append(list(zip(roster['name'], roster['url'])) + [(None, None)] * (12 - size))
+        for player in range(1,13):
+            column = 'team_' + str(team) + '_player_' + str(player)
+            matches_scorecard[column + '_name'] = [roster[player-1][0] for roster in rosters]
+            matches_scorecard[column + '_url'] = [roster[player-1][1] for roster in rosters]
+
+    return matches_scorecard
+
+def synthetic_profiles(players, seed=0):
+    """
+    Given compiled player details, build the player profiles the enrichment stage would parse
+
+    Keywords:
+        players: (pandas.Dataframe) Compiled table of each ODI teams' players
+        seed: (int) seed of the random dates of birth
+
+    Return
+        profiles: (pandas.Dataframe) Date of Birth, styles, batting and bowling details indexed by player URL
+    """
+    rng = np.random.RandomState(seed)
+    profiles = players.drop_duplicates('url').set_index('url')
+    profiles = profiles[['style', 'batting_style', 'bowling_style', 'bat_ave', 'bat_sr', 'bowl_ave', 'bowl_econ', 'bowl_sr']]
+    dob = pd.Timestamp('1940-01-01') + pd.to_timedelta(rng.randint(0, 365 * 60, len(profiles)), unit='D')
+    profiles.insert(0, 'dob', dob)
+
+    return profiles
+
+def best_time(function, repeat=3):
+    """
+    Return the best wall-clock time of a few runs of a function, and its result
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best, result
+
+def main():
+    matches = pd.read_csv('../data/match_results.csv')
+    players = pd.read_csv('../data/complete_player_details.csv')
+    matches_scorecard = synthetic_scorecard(matches, players)
+    profiles = synthetic_profiles(players)
+
+    wide_time, wide = best_time(lambda: complete_scraped_dataframe(matches_scorecard.copy(), profiles=profiles))
+    long_time, _ = best_time(lambda: complete_scraped_long_dataframe(matches_scorecard.copy(), profiles=profiles))
+    pivot_time, pivot = best_time(lambda: complete_scraped_long_dataframe(matches_scorecard.copy(), wide=True, profiles=profiles))
+
+    pd.testing.assert_frame_equal(wide, pivot, check_dtype=False)
+
+    rows = len(matches_scorecard)
+    print('Matches:', rows)
+    print('{:<32}{:>10}{:>14}'.format('Implementation', 'Seconds', 'Rows/sec'))
+    for name, elapsed in [('wide (complete_scraped)', wide_time), ('long', long_time), ('long, pivoted to wide', pivot_time)]:
+        print('{:<32}{:>10.3f}{:>14,.0f}'.format(name, elapsed, rows / elapsed))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+This script checks that the 'lxml' extractor backend gives exactly the same details as the 'bs4'
+backend on every archived webpage (golden check), then benchmarks both backends per page type.
+
+The archive may hold few pages of some types, so the synthetic site of bench_scraper.py (a year of
+results, with its scorecards and players) is checked and benchmarked alongside, covering every page type.
+
+Usage: python benchmarks/bench_extractors.py [repeat] (from the scripts directory)
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from archive import archive_get, archive_urls
+from extractors import extract, BACKENDS, PAGE_TYPES
+from fragments import page_type
+from bench_scraper import synthetic_site
+
+def same(expected, actual):
+    """
+    Compare the details extracted by two backends, treating missing values as equal
+    """
+    if isinstance(expected, pd.DataFrame):
+        return isinstance(actual, pd.DataFrame) and expected.equals(actual)
+    if expected is None or actual is None:
+        return expected is None and actual is None
+    return pd.Series(expected, dtype=object).equals(pd.Series(actual, dtype=object))
+
+def extract_or_error(kind, html, backend):
+    """
+    Extract the details of a webpage, returning the exception type if the backend fails on it
+    """
+    try:
+        return extract(kind, html, backend)
+    except Exception as error:
+        return type(error).__name__
+
+def archived_pages(pages, path=None):
+    """
+    Add the archived webpages of every page type to the lists of pages
+    """
+    for url in archive_urls(path=path):
+        if page_type(url) is not None:
+            pages[page_type(url)].append((url, archive_get(url, path)))
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    pages = {kind: [] for kind in PAGE_TYPES}
+    archived_pages(pages)
+    workdir = tempfile.mkdtemp()
+    synthetic = os.path.join(workdir, 'synthetic.db')
+    synthetic_site(synthetic, [2015])
+    archived_pages(pages, synthetic)
+    shutil.rmtree(workdir, ignore_errors=True)
+    # Scorecards are parsed for their players and for the figures of those players
+    pages['scorecard_stats'] = pages['scorecard']
+
+    # Golden check: the fast backend must reproduce the reference backend on every archived page
+    mismatches = 0
+    for kind in PAGE_TYPES:
+        for url, html in pages[kind]:
+            expected = extract_or_error(kind, html, 'bs4')
+            actual = extract_or_error(kind, html, 'lxml')
+            if isinstance(expected, str) or isinstance(actual, str):
+                ok = expected == actual
+            else:
+                ok = same(expected, actual)
+            if not ok:
+                mismatches += 1
+                print('Mismatch on', url)
+    print('Golden check:', sum(len(p) for p in pages.values()), 'pages,', mismatches, 'mismatches',
+          '(' + ', '.join(kind + ' ' + str(len(pages[kind])) for kind in PAGE_TYPES) + ')')
+
+    print('{:<16}{:>8}'.format('Page type', 'Pages') + ''.join('{:>16}'.format(backend + ' pages/s') for backend in BACKENDS) + '{:>10}'.format('Speedup'))
+    for kind in PAGE_TYPES:
+        if len(pages[kind]) == 0:
+            print('{:<16}{:>8}'.format(kind, 0))
+            continue
+        rates = []
+        for backend in BACKENDS:
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                for url, html in pages[kind]:
+                    extract_or_error(kind, html, backend)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            rates.append(len(pages[kind]) / best)
+        print('{:<16}{:>8}'.format(kind, len(pages[kind])) + ''.join('{:>16,.1f}'.format(rate) for rate in rates) + '{:>10.2f}'.format(rates[-1] / rates[0]))
+
+    if mismatches > 0:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
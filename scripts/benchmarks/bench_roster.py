@@ -0,0 +1,80 @@
+"""
+This script benchmarks the int32 rosters of roster.py against the 48 player name and URL columns of the
+matches scorecard: the memory each takes, and the time to gather the batting and bowling statistics of
+every player slot of every match, by fancy indexing the rosters or by reindexing the profiles column by column.
+
+Rosters are drawn at random for every match in match_results.csv, as in bench_enrichment.py.
+
+Usage: python benchmarks/bench_roster.py (from the scripts directory)
+"""
+
+import os
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from roster import (PlayerRegistry, roster_array, roster_columns, roster_features, roster_memory, save_rosters,
+                    load_rosters, slot_columns)
+from data import player_url
+from bench_enrichment import synthetic_scorecard, synthetic_profiles, best_time
+
+STATS = ['bat_ave', 'bat_sr', 'bowl_ave', 'bowl_econ', 'bowl_sr']
+
+def reindexed_features(matches_scorecard, profiles):
+    """
+    Statistics of every player slot, reindexing the profiles by the URL column of each slot in turn
+    """
+    features = []
+    for slot in slot_columns(''):
+        stats = profiles[STATS].reindex(matches_scorecard[slot + '_url'])
+        stats.index = matches_scorecard.index
+        stats.columns = [slot + '_' + stat for stat in STATS]
+        features.append(stats)
+
+    return pd.concat(features, axis=1)
+
+def main():
+    matches = pd.read_csv('../data/match_results.csv')
+    players = pd.read_csv('../data/complete_player_details.csv')
+    matches_scorecard = synthetic_scorecard(matches, players)
+    profiles = synthetic_profiles(players)
+    # Complete URLs as in data.py, the one incomplete URL being the same player as a complete one
+    for column in slot_columns('_url'):
+        matches_scorecard[column] = matches_scorecard[column].map(player_url)
+    profiles = profiles.set_axis(profiles.index.map(player_url), axis=0)
+    profiles = profiles[~profiles.index.duplicated()]
+
+    intern_time, (registry, rosters) = best_time(lambda: (lambda registry: (registry, roster_array(matches_scorecard, registry)))(PlayerRegistry()))
+    table = registry.details_table(profiles)
+    gather_time, gathered = best_time(lambda: roster_features(rosters, registry, table, STATS, matches_scorecard.index))
+    reindex_time, reindexed = best_time(lambda: reindexed_features(matches_scorecard, profiles))
+
+    # Golden checks: same statistics either way, and the rosters give back the URLs they were built from
+    pd.testing.assert_frame_equal(gathered, reindexed, check_dtype=False)
+    # Names differ from match to match (e.g. a trailing ', '), the registry keeping the first seen
+    columns = slot_columns('_url')
+    pd.testing.assert_frame_equal(roster_columns(rosters, registry, matches_scorecard.index)[columns],
+                                  matches_scorecard[columns].astype(object), check_dtype=False)
+    path = os.path.join(tempfile.mkdtemp(), 'rosters.npz')
+    save_rosters(path, rosters, registry)
+    loaded, loaded_registry = load_rosters(path)
+    assert np.array_equal(loaded, rosters) and np.array_equal(loaded_registry.ids, registry.ids)
+    print('Golden check: passed')
+
+    print('Matches:', len(rosters), '- players:', len(registry), '- rosters:', rosters.shape, rosters.dtype)
+    memory = roster_memory(matches_scorecard, rosters, registry)
+    print('{:<30}{:>12}{:>10}'.format('Representation', 'MiB', 'Ratio'))
+    for name, size in memory.items():
+        print('{:<30}{:>12.2f}{:>10.1f}'.format(name, size / 2**20, memory['object columns'] / size))
+    print('Saved .npz:', round(os.path.getsize(path) / 2**10, 1), 'KiB')
+
+    print('{:<30}{:>12}'.format('Step', 'Seconds'))
+    for name, elapsed in [('intern rosters', intern_time), ('fancy-indexed features', gather_time),
+                          ('reindexed features', reindex_time)]:
+        print('{:<30}{:>12.4f}'.format(name, elapsed))
+
+if __name__ == "__main__":
+    main()
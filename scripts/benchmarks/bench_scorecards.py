@@ -0,0 +1,63 @@
+"""
+This script benchmarks the scorecard parsing stage of extent_scorecard_dataframe, reporting
+scorecards parsed per second serially and with a growing number of worker processes.
+
+Scorecards are read from the archive, so only the parsing is timed. When the archive holds none, as in a
+fresh checkout, the scorecards of the synthetic site of bench_scraper.py are parsed instead.
+
+Usage: python benchmarks/bench_scorecards.py [pages] (from the scripts directory)
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from archive import archive_get, archive_urls
+from extractors import parse_scorecards
+from bench_scraper import synthetic_site
+
+def main():
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 512
+
+    path = None
+    source = 'archived'
+    urls = [url for url in archive_urls('match') if '/engine/match/' in url]
+    if len(urls) == 0:
+        path = os.path.join(tempfile.mkdtemp(), 'synthetic.db')
+        synthetic_site(path, [2015])
+        source = 'synthetic'
+        urls = [url for url in archive_urls('match', path) if '/engine/match/' in url]
+
+    # Recycling the scorecards up to the desired number of pages
+    htmls = [archive_get(url, path) for url in urls[:pages]]
+    if path is not None:
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+    htmls = (htmls * (pages // len(htmls) + 1))[:pages]
+
+    start = time.perf_counter()
+    expected = parse_scorecards(htmls)
+    serial = time.perf_counter() - start
+
+    print('Scorecards:', pages, 'from', len(urls), source)
+    print('{:<12}{:>10}{:>18}{:>10}'.format('Workers', 'Seconds', 'Scorecards/sec', 'Speedup'))
+    print('{:<12}{:>10.3f}{:>18,.1f}{:>10.2f}'.format('serial', serial, pages / serial, 1))
+
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Warming up the worker processes so that start-up is not timed
+            parse_scorecards(htmls[:workers], pool)
+            start = time.perf_counter()
+            scorecards = parse_scorecards(htmls, pool)
+            elapsed = time.perf_counter() - start
+        assert scorecards == expected, 'Parallel parsing changed the scorecards'
+        print('{:<12}{:>10.3f}{:>18,.1f}{:>10.2f}'.format(workers, elapsed, pages / elapsed, serial / elapsed))
+        workers *= 2
+
+if __name__ == "__main__":
+    main()
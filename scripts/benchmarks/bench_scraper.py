@@ -0,0 +1,233 @@
+"""
+This script load-tests the scraper offline: the data.py pipeline (match results, scorecards, player
+profiles and compiled player details) scrapes every webpage through a local replay server (replay.py)
+into a scratch archive, and the run is reported as webpages per second, retries, failures and
+end-to-end time, alongside the server's count of the faults it injected.
+
+The server replays an archive given with --source, or by default a synthetic site of random matches and
+players written in the markup the extractors parse, so that runs are repeatable from a fresh checkout.
+
+Usage: python benchmarks/bench_scraper.py (from the scripts directory)
+       python benchmarks/bench_scraper.py --latency 0.05 --error-rate 0.05 --bad-gateway-rate 0.02 --rate-limit 50
+       python benchmarks/bench_scraper.py --source ../data/archive/archive.db --years 2017 2018
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics
+from archive import archive_put, set_archive_path, ARCHIVE_PATH
+from scrapper import set_politeness
+from profiles import PlayerProfileCache
+from replay import ReplayServer
+from data import (initiate_match_results_dataframe, extent_scorecard_dataframe, complete_scraped_dataframe,
+                  player_details_dataframe)
+
+TEAMS = ['Australia', 'Bangladesh', 'England', 'India', 'New Zealand', 'Pakistan', 'South Africa', 'Sri Lanka',
+         'West Indies', 'Zimbabwe']
+GROUNDS = ['Melbourne', "Lord's", 'Mumbai', 'Auckland', 'Lahore', 'Durban', 'Colombo (RPS)', 'Bridgetown']
+# Roughly the size of a CricInfo webpage, most of it scripts and navigation
+PADDING = 50000
+
+def padded(body, rng):
+    """
+    Wrap the markup of a synthetic webpage in a document padded to the size of a real one
+    """
+    filler = ''.join(rng.choice(list('abcdefghijklmnopqrstuvwxyz '), PADDING))
+    return ('<html><head><title>ESPNcricinfo</title><script type="text/javascript">var filler = "' + filler +
+            '";</script></head><body>' + body + '</body></html>')
+
+def player_href(player_id):
+    return 'http://www.espncricinfo.com/ci/content/player/' + str(player_id) + '.html'
+
+def results_page(matches):
+    """
+    Match results webpage of a year, in the markup of get_odi_match_results
+    """
+    rows = ''
+    for match in matches:
+        rows += ('<tr><td>' + match['team_1'] + '</td><td>' + match['team_2'] + '</td><td>' + match['winner'] + '</td>'
+                 '<td>' + match['margin'] + '</td><td><a href="/ci/content/ground/' + str(match['ground_id']) + '.html">'
+                 + match['ground'] + '</a></td><td>' + match['match_date'].strftime('%b %-d, %Y') + '</td>'
+                 '<td><a href="/ci/engine/match/' + str(match['match_id']) + '.html">ODI # ' + str(match['match_id']) + '</a></td></tr>')
+    return '<table class="engineTable"><thead><tr><th>Team 1</th></tr></thead><tbody>' + rows + '</tbody></table>'
+
+def scorecard_page(match, squads, rng):
+    """
+    Scorecard webpage of a match, in the markup of get_scorecard_details and get_scorecard_stats
+    """
+    innings = ''
+    teams = [match['team_1'], match['team_2']]
+    for batting, bowling in [teams, teams[::-1]]:
+        batsmen = ''
+        for player_id in squads[batting][:11]:
+            batsmen += ('<div class="wrap batsmen"><div class="cell batsmen"><a href="' + player_href(player_id) + '">Player '
+                        + str(player_id) + '</a></div><div class="cell commentary">' + rng.choice(['b Bowler', 'not out']) +
+                        '</div><div class="cell runs">' + str(rng.randint(0, 100)) + '</div><div class="cell runs">'
+                        + str(rng.randint(1, 100)) + '</div></div>')
+        bowlers = ''
+        for player_id in squads[bowling][6:11]:
+            bowlers += ('<tr><td><a href="' + player_href(player_id) + '">Player ' + str(player_id) + '</a></td><td>'
+                        + str(rng.randint(1, 10)) + '</td><td>0</td><td>' + str(rng.randint(10, 70)) + '</td><td>'
+                        + str(rng.randint(0, 4)) + '</td></tr>')
+        innings += ('<li class="accordion-item"><h2>' + batting + ' Innings</h2><div class="scorecard-section batsmen">' + batsmen +
+                    '</div><div class="scorecard-section bowling"><table><thead><tr><th>BOWLING</th><th>O</th><th>M</th>'
+                    '<th>R</th><th>W</th></tr></thead><tbody>' + bowlers + '</tbody></table></div></li>')
+
+    return ('<div class="cscore_info-overview">One-Day International</div><div class="accordion-content collapse in"><ul>'
+            '<li>Attendance: ' + str(rng.randint(1000, 90000)) + '</li></ul></div><ul>' + innings + '</ul>')
+
+def player_page(rng):
+    """
+    Webpage of a player, in the markup of get_player_profile
+    """
+    born = pd.Timestamp('1975-01-01') + pd.Timedelta(days=int(rng.randint(0, 7000)))
+    batting = ('<table class="engineTable"><tr class="head"><th></th><th>Mat</th><th>Runs</th><th>Ave</th><th>SR</th></tr>'
+               '<tr><td>ODIs</td><td>' + str(rng.randint(1, 300)) + '</td><td>' + str(rng.randint(0, 9000)) + '</td><td>'
+               + str(round(rng.uniform(5, 55), 2)) + '</td><td>' + str(round(rng.uniform(50, 110), 2)) + '</td></tr></table>')
+    bowling = ('<table class="engineTable"><tr class="head"><th></th><th>Mat</th><th>Wkts</th><th>Ave</th><th>Econ</th><th>SR</th></tr>'
+               '<tr><td>ODIs</td><td>' + str(rng.randint(1, 300)) + '</td><td>' + str(rng.randint(0, 400)) + '</td><td>'
+               + str(round(rng.uniform(20, 60), 2)) + '</td><td>' + str(round(rng.uniform(3.5, 7), 2)) + '</td><td>'
+               + str(round(rng.uniform(25, 60), 2)) + '</td></tr></table>')
+
+    return ('<p class="ciPlayerinformationtxt"><b>Born</b> <span>' + born.strftime('%B %-d, %Y') + ', Somewhere</span></p>'
+            '<p class="ciPlayerinformationtxt"><b>Playing role</b> <span>' + rng.choice(['Batsman', 'Bowler', 'Allrounder']) + '</span></p>'
+            '<p class="ciPlayerinformationtxt"><b>Batting style</b> <span>Right-hand bat</span></p>'
+            '<p class="ciPlayerinformationtxt"><b>Bowling style</b> <span>Right-arm medium</span></p>' + batting + bowling)
+
+def synthetic_site(path, years, matches_per_year=40, squad_size=15, seed=0):
+    """
+    Write a synthetic site to an archive: the match results of every year, and the scorecard of every match
+    and webpage of every player they link to
+
+    Keywords:
+        path: (str) location of the SQLite archive to write
+        years: (list) years of matches
+        matches_per_year: (int) matches played every year
+        squad_size: (int) players of every team, the first 11 of whom play every match
+        seed: (int) seed of the random site
+
+    Return
+        pages: (int) number of webpages written
+    """
+    rng = np.random.RandomState(seed)
+    squads = {team: [9000000 + i * 100 + j for j in range(squad_size)] for i, team in enumerate(TEAMS)}
+    pages = 0
+    for year in years:
+        matches = []
+        for i in range(matches_per_year):
+            team_1, team_2 = rng.choice(TEAMS, 2, replace=False)
+            ground = int(rng.randint(len(GROUNDS)))
+            matches.append({'team_1': team_1, 'team_2': team_2, 'winner': rng.choice([team_1, team_2]),
+                            'margin': str(rng.randint(1, 10)) + ' wickets' if rng.rand() < 0.5 else str(rng.randint(1, 150)) + ' runs',
+                            'ground': GROUNDS[ground], 'ground_id': 50000 + ground,
+                            'match_date': pd.Timestamp(year, 1, 1) + pd.Timedelta(days=int(i * 365 / matches_per_year)),
+                            'match_id': year * 1000 + i})
+        archive_put('http://stats.espncricinfo.com/ci/engine/records/team/match_results.html?class=2;id=' + str(year) + ';type=year',
+                    padded(results_page(matches), rng), path)
+        for match in matches:
+            squads[match['team_1']] = list(rng.permutation(squads[match['team_1']]))
+            squads[match['team_2']] = list(rng.permutation(squads[match['team_2']]))
+            archive_put('http://stats.espncricinfo.com/ci/engine/match/' + str(match['match_id']) + '.html',
+                        padded(scorecard_page(match, squads, rng), rng), path)
+        pages += 1 + len(matches)
+
+    for squad in squads.values():
+        for player_id in squad:
+            archive_put(player_href(player_id), padded(player_page(rng), rng), path)
+            pages += 1
+
+    return pages
+
+def run_pipeline(start_year, end_year, profile_cache, backend='bs4', workers=None, serial=False):
+    """
+    Run the stages of data.py, as a full run would, without saving the data files
+    """
+    matches = initiate_match_results_dataframe(start_year, end_year, backend=backend)
+    matches_scorecard = extent_scorecard_dataframe(matches, workers=workers, serial=serial, backend=backend)
+    details = complete_scraped_dataframe(matches_scorecard, profile_cache=profile_cache, backend=backend)
+    player_details_dataframe(details, save_to_file=False)
+
+    return matches
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--years', nargs=2, type=int, default=[2015, 2016], help='first and last year of matches')
+    parser.add_argument('--source', default=None, help='archive to replay, a synthetic site by default')
+    parser.add_argument('--matches-per-year', type=int, default=40, help='matches of every year of the synthetic site')
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds every response is delayed by')
+    parser.add_argument('--jitter', type=float, default=0.02, help='up to this many more seconds of random delay')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of "Page error" responses')
+    parser.add_argument('--bad-gateway-rate', type=float, default=0.0, help='share of 502 Bad Gateway responses')
+    parser.add_argument('--rate-limit', type=float, default=None, help='requests per second per host before 429s')
+    parser.add_argument('--burst', type=int, default=8, help='requests allowed back-to-back before the rate limit applies')
+    parser.add_argument('--max-workers', type=int, default=8, help='concurrent requests of the scraper')
+    parser.add_argument('--host-rate', type=float, default=1000, help='requests per second the scraper allows itself per host')
+    parser.add_argument('--backoff', type=float, default=0.05, help='seconds of rest of the scraper before its first retry')
+    parser.add_argument('--backend', default='bs4', help='extractor backend')
+    parser.add_argument('--serial', action='store_true', help='parse scorecards in a single process')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the synthetic site and of the faults')
+    parser.add_argument('--metrics', default=None, help='also save the full metrics report to this file (.json or .prom)')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    source = args.source
+    if source is None:
+        source = os.path.join(workdir, 'source.db')
+        pages = synthetic_site(source, range(args.years[0], args.years[1] + 1), args.matches_per_year, seed=args.seed)
+        print('Synthetic site:', pages, 'webpages')
+
+    # Every webpage is scraped into a scratch archive and profile cache, leaving the real ones untouched
+    set_archive_path(os.path.join(workdir, 'archive.db'))
+    profile_cache = PlayerProfileCache(path=os.path.join(workdir, 'profiles.db'))
+    set_politeness(max_workers=args.max_workers, host_rate=args.host_rate, host_burst=args.max_workers, backoff=args.backoff)
+    metrics.reset()
+
+    proxies = {name: os.environ.pop(name, None) for name in ['HTTP_PROXY', 'http_proxy', 'NO_PROXY', 'no_proxy']}
+    server = ReplayServer(source, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                          bad_gateway_rate=args.bad_gateway_rate, rate_limit=args.rate_limit, burst=args.burst, seed=args.seed)
+    try:
+        with server:
+            os.environ['HTTP_PROXY'] = os.environ['http_proxy'] = server.url
+            start = time.perf_counter()
+            matches = run_pipeline(args.years[0], args.years[1], profile_cache, args.backend, serial=args.serial)
+            elapsed = time.perf_counter() - start
+    finally:
+        for name, value in proxies.items():
+            os.environ.pop(name, None)
+            if value is not None:
+                os.environ[name] = value
+        set_archive_path(ARCHIVE_PATH)
+        set_politeness()
+
+    if args.metrics is not None:
+        metrics.write_report(args.metrics)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    fetched = metrics.counter_value('fetch_responses_total', status=200)
+    requests = metrics.counter_value('fetch_responses_total')
+    print('Matches:', len(matches), '- end-to-end: {:.2f} s'.format(elapsed))
+    print('{:<32}{:>12}'.format('Scraper', ''))
+    print('{:<32}{:>12,.0f}'.format('requests', requests))
+    print('{:<32}{:>12,.0f}'.format('webpages fetched (200)', fetched))
+    print('{:<32}{:>12,.1f}'.format('webpages per second', fetched / elapsed))
+    print('{:<32}{:>12,.0f}'.format('retries', metrics.counter_value('fetch_retries_total')))
+    print('{:<32}{:>12,.0f}'.format('failures (gave up)', metrics.counter_value('fetch_failures_total')))
+    print('{:<32}{:>12,.2f}'.format('fetch seconds (sum)', metrics.histogram_sum('fetch_seconds')))
+    print('{:<32}{:>12,.2f}'.format('throttle wait seconds (sum)', metrics.histogram_sum('throttle_wait_seconds')))
+    for stage in ['match_results', 'scorecards', 'player_profiles', 'player_details', 'compile_players']:
+        print('{:<32}{:>12,.2f}'.format(stage + ' seconds', metrics.histogram_sum('stage_seconds', stage=stage)))
+    print('{:<32}{:>12}'.format('Replay server', ''))
+    for outcome, count in server.stats().items():
+        print('{:<32}{:>12,}'.format(outcome, count))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+This script compares the CSV and Parquet formats of the data files: size on disk, time to load
+everything, and time to load only the columns the modelling step uses.
+
+match_results.csv and complete_player_details.csv are used as they are, the two scorecard files
+are built with random rosters as in benchmarks/bench_enrichment.py. CSV files are loaded with a plain
+pd.read_csv, as the pipeline loaded them before storage.py, and Parquet files with read_table.
+
+Usage: python benchmarks/bench_storage.py (from the scripts directory)
+"""
+
+import os
+import sys
+import time
+import tempfile
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(1, os.path.dirname(os.path.abspath(__file__)))
+
+import storage
+from storage import read_table, write_table, stat_columns
+from data import complete_scraped_dataframe
+from bench_enrichment import synthetic_scorecard, synthetic_profiles
+
+def best_time(function, repeat=5):
+    """
+    Return the best wall-clock time of a few runs of a function
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+def main():
+    matches = pd.read_csv('../data/match_results.csv')
+    players = pd.read_csv('../data/complete_player_details.csv')
+    matches_scorecard = synthetic_scorecard(matches, players)
+    matches_scorecard.insert(9, 'world_cup', False)
+    matches_scorecard.insert(10, 'attendance', None)
+    tables = {'match_results': matches,
+              'matches_scorecard_details': matches_scorecard,
+              'matches_scorecard_player_details': complete_scraped_dataframe(matches_scorecard.copy(), profiles=synthetic_profiles(players)),
+              'complete_player_details': players}
+
+    storage.DATA_DIR = tempfile.mkdtemp()
+    print('{:<34}{:>10}{:>12}{:>10}{:>12}{:>12}{:>14}{:>14}'.format(
+        'Data file', 'Columns', 'CSV MB', 'PQ MB', 'CSV load s', 'PQ load s', 'CSV stats s', 'PQ stats s'))
+    for name, df in tables.items():
+        for file_format in ['csv', 'parquet']:
+            write_table(df, name, file_format)
+        sizes = [os.path.getsize(storage.table_path(name, file_format)) / 1e6 for file_format in ['csv', 'parquet']]
+        loads = [best_time(lambda: pd.read_csv(storage.table_path(name, 'csv'))),
+                 best_time(lambda: read_table(name, file_format='parquet'))]
+
+        # Loading only what the model needs: teams, winner and the batting and bowling statistics
+        columns = [c for c in ['team_1', 'team_2', 'winner'] if c in df.columns] + stat_columns(df.columns)
+        projected = [best_time(lambda: pd.read_csv(storage.table_path(name, 'csv'), usecols=columns)),
+                     best_time(lambda: read_table(name, columns, 'parquet'))]
+
+        print('{:<34}{:>10}{:>12.2f}{:>10.2f}{:>12.3f}{:>12.3f}{:>14.3f}{:>14.3f}'.format(
+            name, len(df.columns), sizes[0], sizes[1], loads[0], loads[1], projected[0], projected[1]))
+
+if __name__ == "__main__":
+    main()
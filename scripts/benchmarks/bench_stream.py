@@ -0,0 +1,123 @@
+"""
+This script checks that an interrupted streaming run of data.py (--stream) resumes to the same data files as
+an uninterrupted one. Runs are stopped during the scorecard pass, during the imputation pass and while
+compiling the players, then run again with the same settings, and every data file is compared.
+
+Webpages come from the synthetic site of bench_scraper.py through the replay server, and every file is
+written to a scratch directory, leaving the data directory untouched.
+
+Usage: python benchmarks/bench_stream.py [chunk_size] (from the scripts directory)
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import data
+import storage
+from archive import set_archive_path, ARCHIVE_PATH
+from profiles import PlayerProfileCache
+from replay import ReplayServer
+from scrapper import set_politeness
+from storage import read_table
+from bench_scraper import synthetic_site
+
+YEARS = [2015, 2016]
+OUTPUTS = ['match_results', 'matches_scorecard_details', 'matches_scorecard_player_details', 'complete_player_details',
+           'player_details_state']
+# Where each run is interrupted: the function of data.py that fails, and on which call
+CRASHES = {'results pass': ('initiate_match_results_dataframe', 2),
+           'scorecard pass': ('extent_scorecard_dataframe', 2),
+           'imputation pass': ('fill_player_details', 2),
+           'compiling players': ('compile_player_details', 1)}
+
+class Interrupted(Exception):
+    """
+    Stands in for whatever stops a run, e.g. a crash or Ctrl+C
+    """
+
+def crash_on(name, call):
+    """
+    Make a function of data.py raise Interrupted on the given call, returning the original function
+    """
+    original = getattr(data, name)
+    calls = [0]
+
+    def crashing(*args, **kwargs):
+        calls[0] += 1
+        if calls[0] == call:
+            raise Interrupted(name)
+        return original(*args, **kwargs)
+
+    setattr(data, name, crashing)
+    return original
+
+def stream(directory, chunk_size):
+    """
+    Run data.py --stream with its data files in the given directory, and read them back
+    """
+    storage.DATA_DIR = directory
+    profile_cache = PlayerProfileCache(path=os.path.join(directory, 'profiles.db'))
+    data.stream_dataframes(YEARS[0], YEARS[-1], chunk_size, serial=True, profile_cache=profile_cache)
+
+    return {name: read_table(name, typed=False) for name in OUTPUTS}
+
+def main():
+    chunk_size = int(sys.argv[1]) if len(sys.argv) > 1 else 15
+
+    workdir = tempfile.mkdtemp()
+    source = os.path.join(workdir, 'source.db')
+    synthetic_site(source, YEARS)
+    set_archive_path(os.path.join(workdir, 'archive.db'))
+    # The replay server is local, there is no website to be polite to
+    set_politeness(max_workers=8, host_rate=1000, host_burst=8, backoff=0.05)
+    data_dir = storage.DATA_DIR
+
+    proxies = {name: os.environ.pop(name, None) for name in ['HTTP_PROXY', 'http_proxy', 'NO_PROXY', 'no_proxy']}
+    failures = 0
+    try:
+        with ReplayServer(source) as server:
+            os.environ['HTTP_PROXY'] = os.environ['http_proxy'] = server.url
+            os.makedirs(os.path.join(workdir, 'reference'))
+            start = time.perf_counter()
+            reference = stream(os.path.join(workdir, 'reference'), chunk_size)
+            print('Uninterrupted run: {:.2f} s, {} matches'.format(time.perf_counter() - start, len(reference['match_results'])))
+
+            print('{:<20}{:>14}{:>12}{:>10}'.format('Interrupted in', 'Stopped', 'Resume s', 'Same'))
+            for case, (name, call) in CRASHES.items():
+                directory = os.path.join(workdir, name)
+                os.makedirs(directory)
+                original = crash_on(name, call)
+                try:
+                    stream(directory, chunk_size)
+                    stopped = False
+                except Interrupted:
+                    stopped = True
+                finally:
+                    setattr(data, name, original)
+
+                start = time.perf_counter()
+                resumed = stream(directory, chunk_size)
+                elapsed = time.perf_counter() - start
+                same = all(reference[table].equals(resumed[table]) for table in OUTPUTS)
+                failures += not (stopped and same)
+                print('{:<20}{:>14}{:>12.2f}{:>10}'.format(case, str(stopped), elapsed, str(same)))
+    finally:
+        for name, value in proxies.items():
+            os.environ.pop(name, None)
+            if value is not None:
+                os.environ[name] = value
+        storage.DATA_DIR = data_dir
+        set_archive_path(ARCHIVE_PATH)
+        set_politeness()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if failures > 0:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -4,235 +4,803 @@ One-Day International (ODI) matche details from ESPN CricInfo.
 
 Created by: Talha Siddiqui
 
-Dependencies: argparse, pandas and bs4
+Dependencies: argparse, numpy, pandas and bs4
 
 Usage: python scripts/data.py 1971 2019
+       python scripts/data.py --incremental (appending matches played since the last run)
+       python scripts/data.py 1971 2019 --stream (a chunk of matches at a time, resuming an interrupted run)
+       python scripts/data.py 2018 2019 --metrics metrics.prom --profile scorecards (timings and profile of the run)
+       python scripts/data.py 1971 2019 --as-of (batting and bowling statistics as of each match date)
+       python scripts/data.py 1971 2019 --long (player enrichment on one row per player slot)
 """
 
 import argparse
+import datetime
+import json
+import os
+import numpy as np
 import pandas as pd
-from bs4 import BeautifulSoup
-
-from scrapper import get_webpage, get_odi_match_results, get_scorecard_details, get_player_details
-
-def initiate_match_results_dataframe(start_year=1971, end_year=2019, save_to_file=False):
+from concurrent.futures import ProcessPoolExecutor
+
+from scrapper import get_webpages
+from extractors import extract, parse_scorecards, BACKENDS
+from profiles import PlayerProfileCache, profiles_dataframe, PROFILES_PATH, PROFILE_COLUMNS
+from storage import read_table, write_table, table_exists, table_path, FORMATS
+from metrics import stage, inc, report, write_report, enable_profiling
+from archive import set_archive_mode, ARCHIVE_MODES
+from asof import AsOfStatsIndex, player_match_stats_dataframe
+from roster import PlayerRegistry, roster_array
+
+@stage('match_results')
+def initiate_match_results_dataframe(start_year=1971, end_year=2019, save_to_file=False, backend='bs4', refresh=False, file_format='csv'):
     """
     Initializes a dataframe that is extracted from the scraped match results webpages
-    between the specified start year and end year excluding matches with no result
+    between the specified start year and end year excluding matches with no result. Years whose webpage
+    could not be scraped raise a RuntimeError naming them, rather than leaving gaps in the match results.
 
     Keywords:
         start_year: (int) ODI matches to scrape from specified year
         end_year: (int) ODI matches to scrape to specified year
         save_to_file: (bool) Keeping a record of generated DataFrame as a CSV
+        backend: (str) Extractor backend parsing the webpages, 'bs4' or 'lxml'
+        refresh: (bool) Scraping the match results webpages again even if they have been archived
+        file_format: (str) Format of the saved file, 'csv' or 'parquet'
 
     Return
         matches: (pandas.Dataframe) High-level summary of ODI matches include teams, ground, winner and margin
     """
 
-    matches = pd.DataFrame(get_odi_match_results(get_webpage('http://stats.espncricinfo.com/ci/engine/records/team/match_results.html?class=2;id='+ str(start_year) +';type=year')))
-    for year in list(range(start_year+1, end_year+1)):
-        soup = get_webpage('http://stats.espncricinfo.com/ci/engine/records/team/match_results.html?class=2;id='+ str(year) +';type=year')
-        matches = matches.append(get_odi_match_results(soup))
+    urls = ['http://stats.espncricinfo.com/ci/engine/records/team/match_results.html?class=2;id='+ str(year) +';type=year'
+            for year in range(int(start_year), int(end_year)+1)]
+
+    # Fetching all the years at once, then putting them back in chronological order
+    results = {}
+    for url, html in get_webpages(urls, parse=False, refresh=refresh):
+        if html is not None:
+            results[url] = extract('results', html, backend)
+    # A year missing from the match results would go unnoticed by every later stage
+    failed = [str(year) for year, url in zip(range(int(start_year), int(end_year)+1), urls) if url not in results]
+    if len(failed) > 0:
+        raise RuntimeError('Could not scrape the match results of ' + ', '.join(failed) + ', try again later.')
+    matches = pd.concat([results[url] for url in urls])
     matches = matches[matches['winner'] != 'no result']
     matches = matches.reset_index(drop=True)
 
     if save_to_file == True:
-        matches.to_csv("../data/match_results.csv", index=False)
+        write_table(matches, 'match_results', file_format)
 
     return matches
 
-def extent_scorecard_dataframe(matches, save_to_file=False):
+MATCH_COLUMNS = ['team1','team2','winner','margin','ground','ground_url','match_date','scorecard','scorecard_url']
+# Attendance and the name and URL of up to 12 players of each team, as listed by get_scorecard_details
+SCORECARD_COLUMNS = ['world_cup','attendance'] + [team + column for team in ['team_1','team_2'] for column in
+                     [''] + ['_player_' + str(player) + '_' + detail for player in range(1,13) for detail in ['name','url']]]
+
+@stage('scorecards')
+def extent_scorecard_dataframe(matches, save_to_file=False, workers=None, serial=False, batch_size=256, backend='bs4', file_format='csv'):
     """
     Adding relevant scorecard details to record of ODI matches (must contain scorecard_url)
 
     Keywords:
         matches (pandas.Dataframe) Table of match results containing scorecard URL
         save_to_file: (bool) Keeping a record of generated DataFrame as a CSV
+        workers: (int) Processes parsing the scorecards, by default one per CPU
+        serial: (bool) Parsing the scorecards in this process instead
+        batch_size: (int) Scorecards fetched and parsed at a time, bounding the raw HTML held in memory
+        backend: (str) Extractor backend parsing the webpages, 'bs4' or 'lxml'
+        file_format: (str) Format of the saved file, 'csv' or 'parquet'
 
     Return
-        matches_scorecard: (pandas.Dataframe) All player and match information DataFrame
+        matches_scorecard: (pandas.Dataframe) All player and match information DataFrame, without the matches whose
+                           scorecard could not be scraped
     """
-    # Utilizing the archive
-    archive = pd.read_csv("../data/archive/archive-matches.csv", index_col=0)
+    links = list(matches['scorecard_url'])
+    pool = None if serial else ProcessPoolExecutor(max_workers=workers)
 
+    # Fetching a batch of scorecards at once, then parsing them across processes in the order of the matches
     scorecard = []
-    for link in matches['scorecard_url']:
-        try:
-            html = archive.loc[link][0]
-            scorecard.append(get_scorecard_details(BeautifulSoup(html, "html.parser")))
-        except KeyError:
-            html = get_webpage(link)
-            scorecard.append(get_scorecard_details(html))
-
-    scorecard_df = pd.DataFrame(scorecard)
-    matches_scorecard = pd.concat([matches, scorecard_df], axis=1, sort=False)
-    matches_scorecard.columns = ['team1','team2','winner','margin','ground','ground_url','match_date','scorecard','scorecard_url',
-                                'world_cup','attendance', 'team_1','team_1_player_1_name','team_1_player_1_url','team_1_player_2_name',
-                                'team_1_player_2_url','team_1_player_3_name','team_1_player_3_url','team_1_player_4_name',
-                                'team_1_player_4_url','team_1_player_5_name','team_1_player_5_url','team_1_player_6_name',
-                                'team_1_player_6_url','team_1_player_7_name','team_1_player_7_url','team_1_player_8_name',
-                                'team_1_player_8_url','team_1_player_9_name','team_1_player_9_url','team_1_player_10_name',
-                                'team_1_player_10_url','team_1_player_11_name','team_1_player_11_url','team_1_player_12_name',
-                                'team_1_player_12_url','team_2','team_2_player_1_name','team_2_player_1_url','team_2_player_2_name',
-                                'team_2_player_2_url','team_2_player_3_name','team_2_player_3_url','team_2_player_4_name',
-                                'team_2_player_4_url','team_2_player_5_name','team_2_player_5_url','team_2_player_6_name',
-                                'team_2_player_6_url','team_2_player_7_name','team_2_player_7_url','team_2_player_8_name',
-                                'team_2_player_8_url','team_2_player_9_name','team_2_player_9_url','team_2_player_10_name',
-                                'team_2_player_10_url','team_2_player_11_name','team_2_player_11_url','team_2_player_12_name',
-                                'team_2_player_12_url']
+    try:
+        for start in range(0, len(links), batch_size):
+            batch = links[start:start+batch_size]
+            pages = dict(get_webpages(batch, parse=False))
+            scorecard += parse_scorecards([pages[link] for link in batch], pool, backend)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    # Scorecards that could not be scraped are left out rather than kept as empty rows
+    scraped = np.array([len(details) > 0 for details in scorecard], dtype=bool)
+    if not scraped.all():
+        print('Skipped', (~scraped).sum(), 'scorecards that could not be scraped:', ', '.join(matches['scorecard_url'][~scraped]))
+        inc('scorecards_skipped_total', int((~scraped).sum()))
+    matches = matches[scraped].set_axis(MATCH_COLUMNS, axis=1)
+    scorecard_df = pd.DataFrame([details for details in scorecard if len(details) > 0], index=matches.index)
+    scorecard_df.columns = SCORECARD_COLUMNS[:scorecard_df.shape[1]]
+    matches_scorecard = pd.concat([matches, scorecard_df.reindex(columns=SCORECARD_COLUMNS)], axis=1, sort=False)
     if save_to_file == True:
-        matches_scorecard.to_csv("../data/matches_scorecard_details.csv", index=False)
+        write_table(matches_scorecard, 'matches_scorecard_details', file_format)
 
     return matches_scorecard
 
-def complete_scraped_dataframe(matches_scorecard, save_to_file=False):
+def player_url(link):
     """
-    Adding player statistics (batting averages, batting strike rate, bowling averages, bowling strike rate and bowling economy) 
-    to matches scorecard DataFrame containing list of players and their corresponding URLs
+    Given a player URL from a scorecard, return the complete URL of the player's webpage
 
     Keywords:
-        matches_scorecard (pandas.Dataframe) Table of match results containing scorecard information i.e. player URLs
+        link: (str) player URL, possibly missing the domain
+
+    Return
+        url: (str) complete player URL, None if there is no player
+    """
+    if type(link) != str:
+        return None
+    # The one-off case where a URL is incomplete
+    if len(link)==29:
+        link = 'http://www.espncricinfo.com'+link
+    return link
+
+@stage('player_match_stats')
+def player_match_stats(matches, save_to_file=False, workers=None, serial=False, batch_size=256, backend='bs4', file_format='csv'):
+    """
+    Tabulating the batting and bowling figures of every player in every match from the scorecards,
+    for the point-in-time statistics of asof.AsOfStatsIndex
+
+    Keywords:
+        matches (pandas.Dataframe) Table of match results containing scorecard URL and match date
         save_to_file: (bool) Keeping a record of generated DataFrame as a CSV
+        workers: (int) Processes parsing the scorecards, by default one per CPU
+        serial: (bool) Parsing the scorecards in this process instead
+        batch_size: (int) Scorecards fetched and parsed at a time, bounding the raw HTML held in memory
+        backend: (str) Extractor backend parsing the webpages, 'bs4' or 'lxml'
+        file_format: (str) Format of the saved file, 'csv' or 'parquet'
 
     Return
-        matches_scorecard: (pandas.Dataframe) Complete table of player details for all played ODIs
+        player_match_stats: (pandas.Dataframe) Runs, balls and dismissals batting, runs, balls and wickets bowling,
+                            one row per player per match
     """
-    # Utilizing the archive
-    archive = pd.read_csv('../data/archive/archive-players.csv', index_col=0)
+    links = list(matches['scorecard_url'])
+    pool = None if serial else ProcessPoolExecutor(max_workers=workers)
+
+    # Same batches as extent_scorecard_dataframe, the scorecards being in the archive by now
+    scorecards = []
+    try:
+        for start in range(0, len(links), batch_size):
+            batch = links[start:start+batch_size]
+            pages = dict(get_webpages(batch, parse=False))
+            scorecards += parse_scorecards([pages[link] for link in batch], pool, backend, page_type='scorecard_stats')
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    scorecards = [[[player_url(url)] + figures for url, *figures in stats] for stats in scorecards]
+    player_match_stats = player_match_stats_dataframe(matches.index, matches['match_date'], scorecards)
+    if save_to_file == True:
+        write_table(player_match_stats, 'player_match_stats', file_format)
 
-    # Looping through all the players from both teams to extract that statistics
-    for team in range(1,3):
-        for player in range(1,13):
-            column = 'team_' + str(team) + '_player_' + str(player) + '_url'
-            player_details = []
-            
-            # Looping through row by row of the matches scorecard
-            for index, row in matches_scorecard.iterrows():
-                link = row[column]
-                match_date = row['match_date']
-                if type(link) != str:
-                    player_details.append([None,None,None,None,None,None,None,None,None])
-                else:
-                    # The one-off case where a URL is incomplete
-                    if len(link)==29:
-                        link = 'http://www.espncricinfo.com'+link
-
-                    # Getting the figures from the player's webpage
-                    try:
-                        html = archive.loc[link][0]
-                        details = get_player_details(BeautifulSoup(html, "html.parser"), str(match_date))
-                        player_details.append(details)
-                    except KeyError:
-                        html = get_webpage(link)
-                        details = get_player_details(html, str(match_date))
-                        player_details.append(details)
-                    except:
-                        player_details.append([None,None,None,None,None,None,None,None,None])                        
-            
-            # Create a DataFrame from all the scraped data from this one player
-            prefix = column[:-3]
-            player_detail_columns = [prefix + 'age', prefix + 'style', prefix + 'batting_style', 
-                                    prefix + 'bowling_style', prefix + 'bat_ave', prefix + 'bat_sr', 
-                                    prefix + 'bowl_ave', prefix + 'bowl_econ', prefix + 'bowl_sr']
-            player_details_df = pd.DataFrame(player_details, columns=player_detail_columns)
-            player_details_df = player_details_df.reset_index(drop=True)
-
-            # Ensure the columns that are about to be appended to the DataFrame are consistent in length
-            if len(matches_scorecard)==len(player_details_df):
-                matches_scorecard = pd.concat([matches_scorecard, player_details_df], axis=1, sort=False)
-            else:
-                print('Dataframe and player details mismatch for:', column)
-
-    ## Handle Missing Values    
-    # Bowling Average: Lower the better, so missing values ought to be the worst a.k.a highest
-    for c in [c for c in matches_scorecard.columns if c[-8:]=="bowl_ave"]:
-        highest = matches_scorecard[c].max()
-        matches_scorecard[c].replace(0,highest, inplace=True)
-        matches_scorecard[c].fillna(highest, inplace=True)
+    return player_match_stats
 
-    # Bowling Economy: Lower the better, so missing values ought to be the worst a.k.a highest
-    for c in [c for c in matches_scorecard.columns if c[-9:]=="bowl_econ"]:
-        highest = matches_scorecard[c].max()
-        matches_scorecard[c].replace(0,highest, inplace=True)
-        matches_scorecard[c].fillna(highest, inplace=True)
+PLAYER_DETAILS = ['age', 'style', 'batting_style', 'bowling_style', 'bat_ave', 'bat_sr', 'bowl_ave', 'bowl_econ', 'bowl_sr']
 
-    # Bowling Strike Rate: Lower the better, so missing values ought to be the worst a.k.a highest
-    for c in [c for c in matches_scorecard.columns if c[-7:]=="bowl_sr"]:
+@stage('player_profiles')
+def player_profiles(links, profile_cache=None, backend='bs4'):
+    """
+    Parsing each player's webpage once, however many matches they played
+
+    Keywords:
+        links: (list) complete player URLs, duplicates and missing values are ignored
+        profile_cache: (PlayerProfileCache) Parsed player profiles, by default persisted alongside the archive
+        backend: (str) Extractor backend parsing the webpages, 'bs4' or 'lxml'
+
+    Return
+        profiles: (pandas.Dataframe) Date of Birth, styles, batting and bowling details indexed by player URL
+    """
+    if profile_cache is None:
+        profile_cache = PlayerProfileCache(path=PROFILES_PATH)
+
+    players = pd.unique(pd.Series(links).dropna())
+    missing = [link for link in players if link not in profile_cache]
+    for link, html in get_webpages(missing, parse=False):
+        # Webpages that could not be fetched are left out of the cache, to be fetched again on the next run
+        if html is None:
+            continue
+        try:
+            profile_cache.put(link, extract('player', html, backend))
+        except Exception:
+            profile_cache.put(link, None)
+
+    return profiles_dataframe(profile_cache, players)
+
+def impute_player_details(matches_scorecard):
+    """
+    Filling in missing and zero player statistics of the wide matches scorecard, one column at a time
+
+    Keywords:
+        matches_scorecard (pandas.Dataframe) Table of match results with player details
+
+    Return
+        matches_scorecard: (pandas.Dataframe) Same table without missing player statistics
+    """
+    # Bowling Average, Economy and Strike Rate: Lower the better, so missing values ought to be the worst a.k.a highest
+    for c in [c for c in matches_scorecard.columns if c[-8:]=="bowl_ave" or c[-9:]=="bowl_econ" or c[-7:]=="bowl_sr"]:
         highest = matches_scorecard[c].max()
-        matches_scorecard[c].replace(0,highest, inplace=True)
-        matches_scorecard[c].fillna(highest, inplace=True)
-        
-    # Batting Average: Higher the better, so missing values ought to be the worst a.k.a lowest after 0
-    for c in [c for c in matches_scorecard.columns if c[-7:]=="bat_ave"]:
-        lowest = matches_scorecard[matches_scorecard[c]>0][c].min()
-        matches_scorecard[c].replace(0,lowest, inplace=True)
-        matches_scorecard[c].fillna(lowest, inplace=True)
+        matches_scorecard[c] = matches_scorecard[c].replace(0,highest).fillna(highest)
 
-    # Batting Strike Rate: Higher the better, so missing values ought to be the worst a.k.a lowest after 0
-    for c in [c for c in matches_scorecard.columns if c[-6:]=="bat_sr"]:
+    # Batting Average and Strike Rate: Higher the better, so missing values ought to be the worst a.k.a lowest after 0
+    for c in [c for c in matches_scorecard.columns if c[-7:]=="bat_ave" or c[-6:]=="bat_sr"]:
         lowest = matches_scorecard[matches_scorecard[c]>0][c].min()
-        matches_scorecard[c].replace(0,lowest, inplace=True)
-        matches_scorecard[c].fillna(lowest, inplace=True)
-        
+        matches_scorecard[c] = matches_scorecard[c].replace(0,lowest).fillna(lowest)
+
     # Age on day of match: Average seems to be the reasonable choice
     for c in [c for c in matches_scorecard.columns if c[-3:]=="age"]:
         avg = matches_scorecard[c].mean()
-        matches_scorecard[c].replace(0,avg, inplace=True)
-        matches_scorecard[c].fillna(avg, inplace=True)
+        matches_scorecard[c] = matches_scorecard[c].replace(0,avg).fillna(avg)
+
+    return matches_scorecard
+
+def imputation_statistics(matches_scorecard, statistics=None):
+    """
+    Folding a chunk of the matches scorecard into the running statistics impute_player_details fills missing values with,
+    so that a table too large for memory can be imputed in a second pass exactly like in one go
+
+    Keywords:
+        matches_scorecard (pandas.Dataframe) Chunk of the table of match results with player details, not imputed
+        statistics: (dict) Running statistics of the previous chunks, None to start afresh
+
+    Return
+        statistics: (dict) Per column highest value (bowling), lowest value after 0 (batting), or sum and count (age)
+    """
+    statistics = {} if statistics is None else statistics
+    for c in matches_scorecard.columns:
+        column = matches_scorecard[c]
+        if c[-8:]=="bowl_ave" or c[-9:]=="bowl_econ" or c[-7:]=="bowl_sr":
+            values = [statistics.get(c), column.max()]
+            values = [value for value in values if value is not None and not pd.isna(value)]
+            statistics[c] = max(values) if len(values) > 0 else None
+        elif c[-7:]=="bat_ave" or c[-6:]=="bat_sr":
+            values = [statistics.get(c), column[column>0].min()]
+            values = [value for value in values if value is not None and not pd.isna(value)]
+            statistics[c] = min(values) if len(values) > 0 else None
+        elif c[-3:]=="age":
+            total, count = statistics.get(c, [0.0, 0])
+            statistics[c] = [total + float(column.sum()), count + int(column.count())]
+
+    return statistics
+
+def fill_player_details(matches_scorecard, statistics):
+    """
+    Filling in missing and zero player statistics of a chunk of the matches scorecard with the statistics of the whole table
+
+    Keywords:
+        matches_scorecard (pandas.Dataframe) Chunk of the table of match results with player details
+        statistics: (dict) Statistics of the whole table, see imputation_statistics
+
+    Return
+        matches_scorecard: (pandas.Dataframe) Same chunk without missing player statistics
+    """
+    for c, value in statistics.items():
+        if c[-3:]=="age":
+            total, count = value
+            value = total / count if count > 0 else None
+        value = float('nan') if value is None else value
+        matches_scorecard[c] = matches_scorecard[c].replace(0,value).fillna(value)
+
+    return matches_scorecard
+
+@stage('player_details')
+def complete_scraped_dataframe(matches_scorecard, save_to_file=False, profile_cache=None, profiles=None, backend='bs4', impute=True, file_format='csv', as_of=None):
+    """
+    Adding player statistics (batting averages, batting strike rate, bowling averages, bowling strike rate and bowling economy) 
+    to matches scorecard DataFrame containing list of players and their corresponding URLs
+
+    Keywords:
+        matches_scorecard (pandas.Dataframe) Table of match results containing scorecard information i.e. player URLs
+        save_to_file: (bool) Keeping a record of generated DataFrame as a CSV
+        profile_cache: (PlayerProfileCache) Parsed player profiles, by default persisted alongside the archive
+        profiles: (pandas.Dataframe) Player profiles indexed by URL, scraped when not given
+        backend: (str) Extractor backend parsing the webpages, 'bs4' or 'lxml'
+        impute: (bool) Filling in missing player statistics, otherwise left for impute_player_details
+        file_format: (str) Format of the saved file, 'csv' or 'parquet'
+        as_of: (asof.AsOfStatsIndex) Batting and bowling statistics as of each match date, replacing the career
+               statistics of the player webpages, which include matches played after the one they describe
+
+    Return
+        matches_scorecard: (pandas.Dataframe) Complete table of player details for all played ODIs
+    """
+    url_columns = ['team_' + str(team) + '_player_' + str(player) + '_url' for team in range(1,3) for player in range(1,13)]
+    # Rosters as player IDs index a table of one row per player, gathering each detail of every slot at once
+    registry = PlayerRegistry()
+    codes = registry.codes(roster_array(matches_scorecard, registry)).reshape(len(matches_scorecard), len(url_columns))
+    if profiles is None:
+        profiles = player_profiles([player_url(link) for link in registry.player_urls()], profile_cache, backend)
+
+    table = registry.details_table(profiles, PROFILE_COLUMNS)
+    # Slot after slot, keeping the type of each detail
+    details = {column: table[column].array.take(codes.T.ravel()) for column in PROFILE_COLUMNS}
+
+    # Age on the day of every match in one go, the rest of the details are the same for every match
+    match_date = pd.to_datetime(matches_scorecard['match_date'])
+    rows = len(matches_scorecard)
+    player_details = {}
+    for i, column in enumerate(url_columns):
+        prefix = column[:-3]
+        for profile_column, detail in zip(PROFILE_COLUMNS, PLAYER_DETAILS):
+            player_details[prefix + detail] = pd.Series(details[profile_column][i*rows:(i+1)*rows], index=matches_scorecard.index)
+        # Date of Birth becomes age
+        player_details[prefix + 'age'] = (match_date - player_details[prefix + 'age']).dt.days
+    matches_scorecard = pd.concat([matches_scorecard, pd.DataFrame(player_details)], axis=1, sort=False)
+
+    if as_of is not None:
+        point_in_time = as_of.player_details(matches_scorecard, player_url)
+        matches_scorecard[point_in_time.columns] = point_in_time
+
+    ## Handle Missing Values
+    if impute == True:
+        matches_scorecard = impute_player_details(matches_scorecard)
     
     if save_to_file == True:
-        matches_scorecard.to_csv("../data/matches_scorecard_player_details.csv", index=False)
+        write_table(matches_scorecard, 'matches_scorecard_player_details', file_format)
     
     return matches_scorecard
 
-def player_details_dataframe(data, save_to_file = True):
+def roster_long_dataframe(matches_scorecard):
     """
-    Using the complete aggregated data for all ODIs, this script compiles each player's information
-    who played on behalf of a certain team.
+    Melting the wide matches scorecard into one row per player slot of every match
 
     Keywords:
-        data (pandas.Dataframe) Complete table of player details for all played ODIs
-        save_to_file: (bool) Keeping a record of generated DataFrame as a CSV
+        matches_scorecard (pandas.Dataframe) Table of match results containing scorecard information i.e. player URLs
 
     Return
-        matches_scorecard: (pandas.Dataframe) Compiled table of each ODI teams' players with their attributes and stats
+        roster: (pandas.Dataframe) match_id (row label of the match), match_date, team_slot, player_slot, team, name and player URL
     """
-    complete = []
+    rosters = []
     for team in range(1,3):
         for player in range(1,13):
             column = 'team_' + str(team) + '_player_' + str(player)
-            # Loop through the data in reverse order to get the most recent players first
-            for index, row in data[::-1].iterrows():
-                player_details = []
-                player_details.append(row['team_' + str(team)])
-                for detail in ['_name', '_url', '_age', '_style', '_batting_style', '_bowling_style', '_bat_ave', '_bat_sr', '_bowl_ave', '_bowl_econ', '_bowl_sr']:
-                    player_details.append(row[column+detail])            
-                complete.append(player_details)
-    player_details_dataframe = pd.DataFrame(complete, columns=['team', 'name', 'url','avg_age','style', 'batting_style', 'bowling_style', 'bat_ave', 'bat_sr', 'bowl_ave', 'bowl_econ', 'bowl_sr']).sort_values('team')
-    player_details_dataframe = player_details_dataframe.groupby(['team', 'name','url', 'style', 'batting_style', 'bowling_style'], sort=False).mean().reset_index()
+            rosters.append(pd.DataFrame({'match_id': matches_scorecard.index,
+                                         'match_date': matches_scorecard['match_date'].values,
+                                         'team_slot': team,
+                                         'player_slot': player,
+                                         'team': matches_scorecard['team_' + str(team)].values,
+                                         'name': matches_scorecard[column + '_name'].values,
+                                         'url': matches_scorecard[column + '_url'].map(player_url).values}))
+    roster = pd.concat(rosters, ignore_index=True)
+
+    return roster
+
+def impute_long_player_details(player_details):
+    """
+    Filling in missing and zero player statistics of the long player details, grouped by player slot
+    so that every slot is filled exactly like its column in the wide matches scorecard
+
+    Keywords:
+        player_details (pandas.Dataframe) One row per player slot of every match with player details
+
+    Return
+        player_details: (pandas.Dataframe) Same table without missing player statistics
+    """
+    slots = [player_details['team_slot'], player_details['player_slot']]
+
+    # Bowling: Lower the better, so missing values ought to be the worst a.k.a highest
+    for c in ['bowl_ave', 'bowl_econ', 'bowl_sr']:
+        fill = player_details[c].groupby(slots).transform('max')
+        player_details[c] = player_details[c].mask(player_details[c].eq(0) | player_details[c].isna(), fill)
+
+    # Batting: Higher the better, so missing values ought to be the worst a.k.a lowest after 0
+    for c in ['bat_ave', 'bat_sr']:
+        fill = player_details[c].where(player_details[c]>0).groupby(slots).transform('min')
+        player_details[c] = player_details[c].mask(player_details[c].eq(0) | player_details[c].isna(), fill)
+
+    # Age on day of match: Average seems to be the reasonable choice
+    fill = player_details['age'].groupby(slots).transform('mean')
+    player_details['age'] = player_details['age'].mask(player_details['age'].eq(0) | player_details['age'].isna(), fill)
+
+    return player_details
+
+@stage('player_details')
+def complete_scraped_long_dataframe(matches_scorecard, wide=False, save_to_file=False, profile_cache=None, profiles=None, backend='bs4', file_format='csv'):
+    """
+    Same player statistics as complete_scraped_dataframe, but computed on one row per player slot of every match:
+    the roster is joined once against the player profiles and imputed with grouped operations.
+
+    Keywords:
+        matches_scorecard (pandas.Dataframe) Table of match results containing scorecard information i.e. player URLs
+        wide: (bool) Pivoting back to the layout of complete_scraped_dataframe
+        save_to_file: (bool) Keeping a record of generated DataFrame as a CSV, in the wide layout
+        profile_cache: (PlayerProfileCache) Parsed player profiles, by default persisted alongside the archive
+        profiles: (pandas.Dataframe) Player profiles indexed by URL, scraped when not given
+        backend: (str) Extractor backend parsing the webpages, 'bs4' or 'lxml'
+        file_format: (str) Format of the saved file, 'csv' or 'parquet'
+
+    Return
+        player_details: (pandas.Dataframe) One row per player slot of every match, or the complete wide table when asked
+    """
+    roster = roster_long_dataframe(matches_scorecard)
+    if profiles is None:
+        profiles = player_profiles(roster['url'], profile_cache, backend)
+
+    player_details = roster.join(profiles, on='url')
+    player_details['age'] = (pd.to_datetime(player_details['match_date']) - player_details['dob']).dt.days
+    player_details = player_details.drop(columns='dob')
+    # Slots where no age needs imputing keep whole days, as the columns of complete_scraped_dataframe do
+    known = player_details['age'].notna() & player_details['age'].ne(0)
+    whole_ages = known.groupby([player_details['team_slot'], player_details['player_slot']]).all()
+    player_details = impute_long_player_details(player_details)
+
+    if wide == True or save_to_file == True:
+        details = player_details.set_index(['match_id', 'team_slot', 'player_slot'])[PLAYER_DETAILS].unstack(['team_slot', 'player_slot'])
+        details = details.reorder_levels([1, 2, 0], axis=1).reindex(columns=pd.MultiIndex.from_product([range(1,3), range(1,13), PLAYER_DETAILS]))
+        details.columns = ['team_' + str(team) + '_player_' + str(player) + '_' + detail for team, player, detail in details.columns]
+        for (team, player), whole in whole_ages.items():
+            column = 'team_' + str(team) + '_player_' + str(player) + '_age'
+            if whole and details[column].notna().all():
+                details[column] = details[column].astype('int64')
+        complete = pd.concat([matches_scorecard, details.reindex(matches_scorecard.index)], axis=1, sort=False)
+
+        if save_to_file == True:
+            write_table(complete, 'matches_scorecard_player_details', file_format)
+        if wide == True:
+            return complete
+
+    return player_details
+
+PLAYER_KEYS = ['team', 'name', 'url', 'style', 'batting_style', 'bowling_style']
+PLAYER_STATS = ['avg_age', 'bat_ave', 'bat_sr', 'bowl_ave', 'bowl_econ', 'bowl_sr']
+
+def player_appearances_dataframe(data):
+    """
+    Stacking the 24 player slots of the complete table into one row per player appearance
+
+    Keywords:
+        data (pandas.Dataframe) Complete table of player details for played ODIs
+
+    Return
+        appearances: (pandas.Dataframe) team, player attributes, stats and match date of every appearance
+    """
+    appearances = []
+    for team in range(1,3):
+        for player in range(1,13):
+            column = 'team_' + str(team) + '_player_' + str(player)
+            slot = {'team': data['team_' + str(team)].to_numpy(dtype=object)}
+            for key in PLAYER_KEYS[1:]:
+                slot[key] = data[column + '_' + key].to_numpy(dtype=object)
+            for stat in PLAYER_STATS:
+                slot[stat] = data[column + '_' + stat.replace('avg_', '')].to_numpy(dtype=float)
+            slot['match_date'] = pd.to_datetime(data['match_date']).to_numpy()
+            appearances.append(pd.DataFrame(slot))
+
+    return pd.concat(appearances, ignore_index=True)
+
+def fold_player_details_state(appearances, state=None):
+    """
+    Folding player appearances into the running sums and counts of every player's stats per team,
+    so that new matches are added without going over the old ones again
+
+    Keywords:
+        appearances: (pandas.Dataframe) One row per player appearance, see player_appearances_dataframe
+        state: (pandas.Dataframe) Aggregate state of previously compiled matches, None to start afresh
+
+    Return
+        state: (pandas.Dataframe) Sums and counts of each stat and the last match played, per team and player
+    """
+    # Players with any attribute missing are left out, as in a groupby of the attributes
+    appearances = appearances.dropna(subset=PLAYER_KEYS)
+    groups = appearances.groupby(PLAYER_KEYS, sort=False)
+    folded = pd.concat([groups[PLAYER_STATS].sum().add_suffix('_sum'),
+                        groups[PLAYER_STATS].count().add_suffix('_count'),
+                        groups['match_date'].max().rename('last_played')], axis=1)
+
+    if state is not None and len(state) > 0:
+        state = state.copy()
+        state[PLAYER_KEYS] = state[PLAYER_KEYS].astype(object)
+        state['last_played'] = pd.to_datetime(state['last_played'])
+        folded = pd.concat([state.set_index(PLAYER_KEYS), folded], sort=False)
+        aggregations = {column: 'sum' for column in folded.columns}
+        aggregations['last_played'] = 'max'
+        folded = folded.groupby(level=PLAYER_KEYS, sort=False).agg(aggregations)
+
+    return folded.reset_index()
+
+def compile_player_details(state):
+    """
+    Turning the aggregate state into the compiled table of each team's players, most recent players first
+
+    Keywords:
+        state: (pandas.Dataframe) Sums and counts of each stat and the last match played, per team and player
+
+    Return
+        player_details: (pandas.Dataframe) Compiled table of each ODI teams' players with their average attributes and stats
+    """
+    state = state.sort_values(['team', 'last_played'], ascending=[True, False], kind='mergesort')
+    player_details = state[PLAYER_KEYS].copy()
+    for stat in PLAYER_STATS:
+        player_details[stat] = state[stat + '_sum'] / state[stat + '_count'].where(state[stat + '_count'] > 0)
+
+    return player_details.reset_index(drop=True)
+
+@stage('compile_players')
+def player_details_dataframe(data, save_to_file = True, file_format='csv', state=None):
+    """
+    Using the complete aggregated data for all ODIs, this script compiles each player's information
+    who played on behalf of a certain team.
+
+    Keywords:
+        data (pandas.Dataframe) Complete table of player details for all played ODIs, or only the new ones when state is given
+        save_to_file: (bool) Keeping a record of generated DataFrame, and of the aggregate state, as a CSV
+        file_format: (str) Format of the saved file, 'csv' or 'parquet'
+        state: (pandas.Dataframe) Aggregate state of the previously compiled ODIs, see fold_player_details_state
+
+    Return
+        matches_scorecard: (pandas.Dataframe) Compiled table of each ODI teams' players with their attributes and stats
+    """
+    state = fold_player_details_state(player_appearances_dataframe(data), state)
+    player_details_dataframe = compile_player_details(state)
     
     if save_to_file == True:
-        player_details_dataframe.to_csv("../data/complete_player_details.csv", index=False)
+        write_table(player_details_dataframe, 'complete_player_details', file_format)
+        write_table(state, 'player_details_state', file_format)
 
     return player_details_dataframe
 
+@stage('incremental_update')
+def update_dataframes(end_year, backend='bs4', workers=None, serial=False, file_format='csv'):
+    """
+    Incrementally bringing the saved data files up to date: only the matches missing from
+    matches_scorecard_player_details.csv are scraped and enriched, then appended to every file, and only the
+    players of those matches are folded into complete_player_details.csv. match_results.csv is appended to
+    last, so a run that fails half way is picked up again by the next one.
+
+    Keywords:
+        end_year: (int) ODI matches to scrape to specified year
+        backend: (str) Extractor backend parsing the webpages, 'bs4' or 'lxml'
+        workers: (int) Processes parsing the scorecards, by default one per CPU
+        serial: (bool) Parsing the scorecards in this process instead
+        file_format: (str) Format of the saved files, 'csv' or 'parquet'
+
+    Return
+        matches: (pandas.Dataframe) High-level summary of the newly added ODI matches
+    """
+    complete = read_table('matches_scorecard_player_details', file_format=file_format, typed=False)
+    complete['match_date'] = pd.to_datetime(complete['match_date'])
+
+    # Match results of the last complete year onwards are scraped again, as they may have changed since archived
+    matches = initiate_match_results_dataframe(start_year=complete['match_date'].max().year, end_year=end_year,
+                                               backend=backend, refresh=True)
+    matches = matches[~matches['scorecard_url'].isin(complete['scorecard_url'])].reset_index(drop=True)
+    if len(matches) == 0:
+        print('Already up to date with', len(complete), 'matches.')
+        return matches
+
+    matches_scorecard = extent_scorecard_dataframe(matches, workers=workers, serial=serial, backend=backend)
+    matches = matches[matches['scorecard_url'].isin(matches_scorecard['scorecard_url'])]
+    if len(matches) == 0:
+        print('None of the new scorecards could be scraped, try again later.')
+        return matches
+    # Rows a failed run already wrote are not written again
+    saved = read_table('matches_scorecard_details', ['scorecard_url'], file_format)['scorecard_url']
+    write_table(matches_scorecard[~matches_scorecard['scorecard_url'].isin(saved)], 'matches_scorecard_details', file_format, append=True)
+
+    # New matches are imputed alongside the saved ones, which are already complete and stay untouched
+    matches_scorecard = complete_scraped_dataframe(matches_scorecard, backend=backend, impute=False)
+    matches_scorecard.index = range(len(complete), len(complete) + len(matches_scorecard))
+    complete = impute_player_details(pd.concat([complete, matches_scorecard], sort=False))
+    write_table(complete.loc[matches_scorecard.index], 'matches_scorecard_player_details', file_format, append=True)
+
+    # Folding only the new matches into the players' running totals
+    if table_exists('player_details_state', file_format):
+        state = read_table('player_details_state', file_format=file_format, typed=False)
+        players = player_details_dataframe(complete.loc[matches_scorecard.index], file_format=file_format, state=state)
+    else:
+        players = player_details_dataframe(complete, file_format=file_format)
+
+    known = read_table('match_results', ['scorecard_url'], file_format)['scorecard_url']
+    write_table(matches[~matches['scorecard_url'].isin(known)], 'match_results', file_format, append=True)
+
+    print('Added', len(matches), 'matches, now compiling', len(players), 'players.')
+    return matches
+
+STREAM_TABLES = ['match_results', 'matches_scorecard_details', 'matches_scorecard_player_details_unimputed',
+                 'matches_scorecard_player_details']
+
+def read_checkpoint(settings):
+    """
+    Loading the checkpoint of an interrupted streaming run, provided it was started with the same settings
+
+    Keywords:
+        settings: (dict) start year, end year and chunk size of the run
+
+    Return
+        checkpoint: (dict) progress of the run, a fresh one when there is nothing to resume
+    """
+    path = table_path('checkpoint', 'json')
+    if os.path.exists(path):
+        with open(path) as f:
+            checkpoint = json.load(f)
+        if checkpoint['settings'] == settings:
+            return checkpoint
+        print('Ignoring the checkpoint of a run with different settings:', checkpoint['settings'])
+
+    return {'settings': settings, 'next_year': settings['start_year'], 'matches': 0, 'imputed': 0,
+            'statistics': None, 'sizes': {}}
+
+def commit_checkpoint(checkpoint):
+    """
+    Recording progress once the output of a chunk is saved. The size of every output file is kept,
+    so that rows written after the last commit can be dropped on resume. Written atomically.
+    """
+    checkpoint['sizes'] = {name: os.path.getsize(table_path(name)) for name in STREAM_TABLES if table_exists(name)}
+    path = table_path('checkpoint', 'json')
+    with open(path + '.tmp', 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(path + '.tmp', path)
+
+def rollback_outputs(checkpoint):
+    """
+    Truncating the output files to their size at the last commit, removing the ones that were started after it
+    """
+    for name in STREAM_TABLES:
+        if not table_exists(name):
+            continue
+        if name in checkpoint['sizes']:
+            with open(table_path(name), 'r+b') as f:
+                f.truncate(checkpoint['sizes'][name])
+        else:
+            os.remove(table_path(name))
+
+@stage('stream')
+def stream_dataframes(start_year=1971, end_year=2019, chunk_size=500, backend='bs4', workers=None, serial=False, restart=False,
+                      profile_cache=None):
+    """
+    Building the same data files as the stages run one after the other, but a chunk of matches at a time so that
+    memory stays flat however many years are scraped. Every chunk is committed to a checkpoint, and an
+    interrupted run resumes from the last committed chunk. Imputation takes a second pass over the saved chunks,
+    with the statistics of the whole table gathered during the first one. The files are saved as CSV.
+
+    Keywords:
+        start_year: (int) ODI matches to scrape from specified year
+        end_year: (int) ODI matches to scrape to specified year
+        chunk_size: (int) Matches scraped, parsed and enriched at a time
+        backend: (str) Extractor backend parsing the webpages, 'bs4' or 'lxml'
+        workers: (int) Processes parsing the scorecards, by default one per CPU
+        serial: (bool) Parsing the scorecards in this process instead
+        restart: (bool) Starting afresh even if there is a checkpoint to resume from
+        profile_cache: (PlayerProfileCache) Parsed player profiles, by default persisted alongside the archive
+
+    Return
+        player_details: (pandas.Dataframe) Compiled table of each ODI teams' players with their attributes and stats
+    """
+    settings = {'start_year': int(start_year), 'end_year': int(end_year), 'chunk_size': int(chunk_size)}
+    if restart == True and os.path.exists(table_path('checkpoint', 'json')):
+        os.remove(table_path('checkpoint', 'json'))
+    checkpoint = read_checkpoint(settings)
+    rollback_outputs(checkpoint)
+    if len(checkpoint['sizes']) > 0:
+        print('Resuming from', checkpoint['next_year'], 'with', checkpoint['matches'], 'matches scraped and',
+              checkpoint['imputed'], 'imputed.')
+
+    # Match results, a year at a time
+    while checkpoint['next_year'] <= settings['end_year']:
+        year = checkpoint['next_year']
+        # A year that cannot be scraped raises before the checkpoint moves on, so the next run tries it again
+        matches = initiate_match_results_dataframe(start_year=year, end_year=year, backend=backend)
+        if len(matches) > 0:
+            write_table(matches, 'match_results', append=table_exists('match_results'))
+        checkpoint['next_year'] = year + 1
+        commit_checkpoint(checkpoint)
+
+    # Scorecards and player details of a chunk of matches, gathering the statistics to impute them with
+    if profile_cache is None:
+        profile_cache = PlayerProfileCache(path=PROFILES_PATH)
+    done = checkpoint['matches']
+    for matches in pd.read_csv(table_path('match_results'), chunksize=chunk_size, skiprows=range(1, done+1)):
+        # Resuming after the last chunk, only the header is left to read
+        if len(matches) == 0:
+            continue
+        matches.index = range(done, done + len(matches))
+        matches_scorecard = extent_scorecard_dataframe(matches, workers=workers, serial=serial, backend=backend)
+        write_table(matches_scorecard, 'matches_scorecard_details', append=done > 0)
+        matches_scorecard = complete_scraped_dataframe(matches_scorecard, profile_cache=profile_cache, backend=backend, impute=False)
+        write_table(matches_scorecard, 'matches_scorecard_player_details_unimputed', append=done > 0)
+
+        done += len(matches)
+        checkpoint['matches'] = done
+        checkpoint['statistics'] = imputation_statistics(matches_scorecard, checkpoint['statistics'])
+        commit_checkpoint(checkpoint)
+
+    # Second pass imputing every chunk, and folding its players into the running totals. The totals
+    # of the chunks imputed before an interruption are folded again from the saved rows
+    state = None
+    if checkpoint['imputed'] > 0:
+        for data in pd.read_csv(table_path('matches_scorecard_player_details'), chunksize=chunk_size):
+            state = fold_player_details_state(player_appearances_dataframe(data), state)
+    done = checkpoint['imputed']
+    for data in pd.read_csv(table_path('matches_scorecard_player_details_unimputed'), chunksize=chunk_size, skiprows=range(1, done+1)):
+        if len(data) == 0:
+            continue
+        data = fill_player_details(data, checkpoint['statistics'])
+        write_table(data, 'matches_scorecard_player_details', append=done > 0)
+        state = fold_player_details_state(player_appearances_dataframe(data), state)
+
+        done += len(data)
+        checkpoint['imputed'] = done
+        commit_checkpoint(checkpoint)
+
+    player_details = compile_player_details(state)
+    write_table(player_details, 'complete_player_details')
+    write_table(state, 'player_details_state')
+
+    # The run is complete, nothing left to resume
+    os.remove(table_path('matches_scorecard_player_details_unimputed'))
+    os.remove(table_path('checkpoint', 'json'))
+
+    return player_details
+
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument('start_year')
-    parser.add_argument('end_year')
+    parser.add_argument('start_year', nargs='?', default=1971)
+    parser.add_argument('end_year', nargs='?', default=datetime.date.today().year)
+    parser.add_argument('--incremental', action='store_true', help='only scrape and append matches missing from the saved CSVs')
+    parser.add_argument('--workers', type=int, default=None, help='processes parsing scorecards, one per CPU by default')
+    parser.add_argument('--serial', action='store_true', help='parse scorecards in a single process')
+    parser.add_argument('--backend', choices=BACKENDS, default='bs4', help='extractor parsing the webpages')
+    parser.add_argument('--format', choices=FORMATS, default='csv', help='format of the saved data files')
+    parser.add_argument('--stream', action='store_true', help='scrape in chunks of matches, resuming from the last checkpoint')
+    parser.add_argument('--chunk-size', type=int, default=500, help='matches per chunk of a streaming run')
+    parser.add_argument('--restart', action='store_true', help='start a streaming run afresh instead of resuming it')
+    parser.add_argument('--as-of', action='store_true', help='batting and bowling statistics as of each match date, from the scorecards')
+    parser.add_argument('--long', action='store_true', help='enrich the players on one row per player slot, then pivot back')
+    parser.add_argument('--archive-mode', choices=ARCHIVE_MODES, default='page', help='archive whole webpages, or only the fragments the extractors read')
+    parser.add_argument('--metrics', default=None, help='file to save the timings and counts of the run to (.json or .prom), printed when not given')
+    parser.add_argument('--profile', nargs='+', default=[], help='stages to profile with cProfile, or all')
+    parser.add_argument('--profile-dir', default='.', help='where to save the .prof files of the profiled stages')
     args = parser.parse_args()
 
+    enable_profiling(args.profile, args.profile_dir)
+    set_archive_mode(args.archive_mode)
+    try:
+        run(args)
+    finally:
+        # Reporting even when the run fails, as that is when the timings are most wanted
+        if args.metrics is not None:
+            write_report(args.metrics)
+        else:
+            print(report())
+
+def run(args):
+    if args.as_of and (args.stream or args.incremental):
+        raise SystemExit('Point-in-time statistics are only built by full runs, drop --as-of or --stream/--incremental.')
+    if args.long and (args.as_of or args.stream or args.incremental):
+        raise SystemExit('The long-format enrichment applies to full runs only, drop --long or --as-of/--stream/--incremental.')
+
+    if args.stream:
+        if args.format != 'csv':
+            raise SystemExit('Streaming runs save the data files as CSV, drop --format or use --format csv.')
+        stream_dataframes(args.start_year, args.end_year, args.chunk_size, backend=args.backend, workers=args.workers,
+                          serial=args.serial, restart=args.restart)
+        return
+
+    if args.incremental:
+        update_dataframes(args.end_year, backend=args.backend, workers=args.workers, serial=args.serial, file_format=args.format)
+        return
+
     # Initial set of ODI matches played in the desired years
-    matches = initiate_match_results_dataframe(start_year=args.start_year, end_year=args.end_year, save_to_file=True)
+    matches = initiate_match_results_dataframe(start_year=args.start_year, end_year=args.end_year, save_to_file=True, backend=args.backend, file_format=args.format)
 
     # For the ODI scraped above, extending details with player names and URLs
-    matches_scorecard = extent_scorecard_dataframe(matches, save_to_file=True)
+    matches_scorecard = extent_scorecard_dataframe(matches, save_to_file=True, workers=args.workers, serial=args.serial, backend=args.backend, file_format=args.format)
+
+    # Each player's figures in each ODI match, for their statistics as they stood before every match
+    as_of = None
+    if args.as_of:
+        as_of = AsOfStatsIndex(player_match_stats(matches, save_to_file=True, workers=args.workers, serial=args.serial, backend=args.backend, file_format=args.format))
 
     # Aggregating each player's information for each ODI match
-    matches_scorecard_player_details = complete_scraped_dataframe(matches_scorecard, save_to_file=True)
+    if args.long:
+        matches_scorecard_player_details = complete_scraped_long_dataframe(matches_scorecard, wide=True, save_to_file=True, backend=args.backend, file_format=args.format)
+    else:
+        matches_scorecard_player_details = complete_scraped_dataframe(matches_scorecard, save_to_file=True, backend=args.backend, file_format=args.format, as_of=as_of)
 
     # Compiling a record of each teams' players
-    player_details_dataframe(matches_scorecard_player_details, save_to_file=True)
+    player_details_dataframe(matches_scorecard_player_details, save_to_file=True, file_format=args.format)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,284 @@
+"""
+This script rates ODI teams with an Elo-style system from match results alone, a baseline that needs no
+player scraping. Matches are read once in date order: every result moves the ratings of both teams by
+how surprising it was, scaled by the margin of victory, with an advantage for the home team. The rating
+of every team after every match is kept, so ratings can be looked up at any date, and new results can be
+added as they come in.
+
+The home team of a ground is guessed from the matches played there so far: the team that played there
+at least HOME_DOMINANCE times as often as any other. Grounds without such a team are neutral.
+
+Dependencies: argparse, numpy and pandas
+
+Usage: python elo.py
+       python elo.py --team India --team Pakistan (rating history)
+       python elo.py --fixture England India --ground "Lord's"
+       python elo.py --update 2019 (adding the latest results of the year to the ratings)
+"""
+
+import argparse
+import bisect
+import math
+import time
+import numpy as np
+import pandas as pd
+
+from storage import read_table
+
+INITIAL_RATING = 1500.0
+K_FACTOR = 20.0
+# Rating points the home team is worth, on top of its rating
+HOME_ADVANTAGE = 50.0
+HOME_DOMINANCE = 1.5
+HOME_MIN_MATCHES = 3
+# A win by RUNS_PER_WICKET runs is worth as much as a win by one wicket
+RUNS_PER_WICKET = 10.0
+
+def margin_wickets(margins):
+    """
+    Given margins of victory, e.g. '5 wickets' or '27 runs', return each as a number of wickets
+
+    Keywords:
+        margins: (pandas.Series) margins as written in the match results
+
+    Return
+        wickets: (numpy.ndarray) margin in wickets, runs worth 1/RUNS_PER_WICKET of a wicket, NaN when unknown
+    """
+    # Only the few distinct margins are parsed
+    codes, uniques = pd.factorize(margins.astype(object))
+    parts = pd.Series(uniques, dtype=object).str.extract(r'(\d+)\s*(run|wicket)')
+    wickets = np.where(parts[1] == 'run', parts[0].astype(float) / RUNS_PER_WICKET, parts[0].astype(float))
+
+    return np.append(wickets, np.nan)[codes]
+
+def expected_score(rating_difference):
+    """
+    Given how many rating points a team is ahead (home advantage included), return its chances of winning
+    """
+    return 1.0 / (1.0 + 10.0 ** (-rating_difference / 400.0))
+
+def margin_multiplier(margin, winner_difference):
+    """
+    Scale of a rating change by margin of victory: larger for bigger wins, but less so for favourites
+    winning as expected, so that strong teams do not run away with the ratings
+
+    Keywords:
+        margin: (float) margin in wickets, NaN when unknown (e.g. ties and matches decided by D/L)
+        winner_difference: (float) how many rating points the winner was ahead before the match
+    """
+    if math.isnan(margin):
+        return 1.0
+    return math.log1p(margin) * 2.2 / (winner_difference * 0.001 + 2.2)
+
+def promote(leaders, team, matches):
+    """
+    Given the two teams that played the most at a ground, as [team, matches, team, matches], update them
+    after a team played there again, bringing its number of matches up to matches
+    """
+    if leaders[0] == team:
+        leaders[1] = matches
+    elif matches > leaders[1]:
+        leaders[:] = [team, matches, leaders[0], leaders[1]]
+    elif leaders[2] == team or matches > leaders[3]:
+        leaders[2:] = [team, matches]
+
+def dominant_team(leaders):
+    """
+    Given the two teams that played the most at a ground, return the first if it played there at least
+    HOME_DOMINANCE times as often as the second (and HOME_MIN_MATCHES times), None otherwise
+    """
+    if leaders[1] < HOME_MIN_MATCHES or leaders[1] < HOME_DOMINANCE * leaders[3]:
+        return None
+    return leaders[0]
+
+class EloRatings:
+    """
+    Ratings of every team, with the history of each and the home team of every ground
+
+    Keywords:
+        k_factor: (float) largest rating change of an even match won by an average margin
+        home_advantage: (float) rating points the home team is worth
+        initial_rating: (float) rating of teams playing their first match
+    """
+
+    def __init__(self, k_factor=K_FACTOR, home_advantage=HOME_ADVANTAGE, initial_rating=INITIAL_RATING):
+        self.k_factor = k_factor
+        self.home_advantage = home_advantage
+        self.initial_rating = initial_rating
+        self.ratings = {}
+        # Per team, the dates and ratings after each of its matches, in date order
+        self.dates = {}
+        self.history = {}
+        # Per ground, the matches each team played there, the two teams that played there the most, and its home team
+        self.appearances = {}
+        self.leaders = {}
+        self.homes = {}
+        self.seen = set()
+        self.matches = 0
+
+    def rating(self, team, date=None):
+        """
+        Return the rating of a team, as it stood before the given date, the current one by default
+        """
+        if date is None:
+            return self.ratings.get(team, self.initial_rating)
+        dates = self.dates.get(team, [])
+        i = bisect.bisect_left(dates, np.datetime64(pd.Timestamp(date), 'ns'))
+        return self.history[team][i-1] if i > 0 else self.initial_rating
+
+    def home_team(self, ground):
+        """
+        Return the home team of a ground from the matches played there so far, None for neutral grounds
+        """
+        return self.homes.get(ground)
+
+    def advantage(self, team_1, team_2, ground):
+        """
+        Return the rating points team_1 has over team_2 at a ground, home advantage included
+        """
+        difference = self.rating(team_1) - self.rating(team_2)
+        home = self.home_team(ground) if ground is not None else None
+        if home == team_1:
+            difference += self.home_advantage
+        elif home == team_2:
+            difference -= self.home_advantage
+        return difference
+
+    def predict(self, team_1, team_2, ground=None):
+        """
+        Return the chances of team_1 beating team_2, at a ground when given, with the current ratings
+        """
+        return expected_score(self.advantage(team_1, team_2, ground))
+
+    def record(self, team, change, match_date):
+        """
+        Change the rating of a team after a match, keeping it in its history
+        """
+        rating = self.ratings.get(team, self.initial_rating) + change
+        self.ratings[team] = rating
+        if team not in self.history:
+            self.dates[team] = []
+            self.history[team] = []
+        self.dates[team].append(match_date)
+        self.history[team].append(rating)
+
+    def update(self, team_1, team_2, winner, margin=float('nan'), ground=None, match_date=None):
+        """
+        Rate a single match, which must not be older than the matches rated so far
+
+        Keywords:
+            team_1, team_2: (str) teams of the match
+            winner: (str) one of the teams, or 'tied'
+            margin: (float) margin of victory in wickets, see margin_wickets
+            ground: (str) ground of the match
+            match_date: (numpy.datetime64) date of the match
+
+        Return
+            change: (float) rating points team_1 gained, and team_2 lost
+        """
+        difference = self.advantage(team_1, team_2, ground)
+        expected = expected_score(difference)
+        if winner == team_1:
+            score, multiplier = 1.0, margin_multiplier(margin, difference)
+        elif winner == team_2:
+            score, multiplier = 0.0, margin_multiplier(margin, -difference)
+        else:
+            score, multiplier = 0.5, 1.0
+        change = self.k_factor * multiplier * (score - expected)
+
+        self.record(team_1, change, match_date)
+        self.record(team_2, -change, match_date)
+        if ground is not None:
+            played = self.appearances.setdefault(ground, {})
+            leaders = self.leaders.setdefault(ground, [None, 0, None, 0])
+            for team in (team_1, team_2):
+                played[team] = played.get(team, 0) + 1
+                promote(leaders, team, played[team])
+            self.homes[ground] = dominant_team(leaders)
+        self.matches += 1
+
+        return change
+
+    def update_results(self, matches):
+        """
+        Rate match results in date order, in a single pass. Matches already rated, by scorecard URL, are skipped.
+
+        Keywords:
+            matches: (pandas.Dataframe) match results as in match_results.csv or from get_odi_match_results,
+                     played after the matches rated so far
+
+        Return
+            changes: (pandas.Series) rating points team_1 gained in every rated match, indexed like matches
+        """
+        rated = ~matches['winner'].isin(['no result', 'abandoned']).to_numpy()
+        if 'scorecard_url' in matches:
+            urls = matches['scorecard_url'].to_numpy(dtype=object)
+            rated &= ~pd.Series(urls).duplicated().to_numpy() & np.array([url not in self.seen for url in urls], dtype=bool)
+            self.seen.update(urls[rated])
+        # Same day matches keep the order of the results
+        match_date = pd.to_datetime(matches['match_date']).to_numpy()
+        order = np.flatnonzero(rated)
+        order = order[np.argsort(match_date[order], kind='stable')]
+
+        columns = [matches[column].to_numpy(dtype=object)[order].tolist() for column in ['team_1', 'team_2', 'winner']]
+        changes = [self.update(*match) for match in zip(*columns, margin_wickets(matches['margin']).take(order).tolist(),
+                                                        matches['ground'].to_numpy(dtype=object)[order].tolist(),
+                                                        match_date[order])]
+        matches = matches.iloc[order]
+
+        return pd.Series(changes, index=matches.index, dtype=float)
+
+    def table(self):
+        """
+        Return the current rating of every team, best first, with its number of matches and last match
+        """
+        table = pd.DataFrame({'rating': self.ratings,
+                              'matches': {team: len(dates) for team, dates in self.dates.items()},
+                              'last_match': {team: dates[-1] for team, dates in self.dates.items()}})
+        return table.sort_values('rating', ascending=False)
+
+    def team_history(self, team):
+        """
+        Return the rating of a team after each of its matches
+        """
+        return pd.Series(self.history.get(team, []), index=pd.DatetimeIndex(self.dates.get(team, []), name='match_date'),
+                         name=team)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--team', action='append', default=[], help='print the rating history of a team')
+    parser.add_argument('--fixture', nargs=2, metavar=('TEAM_1', 'TEAM_2'), help='chances of each team winning a match')
+    parser.add_argument('--ground', default=None, help='ground of the fixture, for home advantage')
+    parser.add_argument('--update', type=int, metavar='YEAR', help='add the results of a year not yet in match_results.csv')
+    args = parser.parse_args()
+
+    matches = read_table('match_results', typed=False)
+    elo = EloRatings()
+    start = time.perf_counter()
+    elo.update_results(matches)
+    elapsed = time.perf_counter() - start
+
+    if args.update is not None:
+        # Fetching the results of the year again, only the matches missing from match_results.csv are rated
+        from data import initiate_match_results_dataframe
+        latest = initiate_match_results_dataframe(args.update, args.update, refresh=True)
+        changes = elo.update_results(latest)
+        print('Rated', len(changes), 'new matches')
+
+    print(elo.table().round({'rating': 1}).to_string())
+    print()
+    print('Rated', elo.matches, 'matches in', round(elapsed * 1000, 1), 'ms')
+
+    for team in args.team:
+        print()
+        print(elo.team_history(team).round(1).to_string())
+
+    if args.fixture is not None:
+        team_1, team_2 = args.fixture
+        chances = elo.predict(team_1, team_2, args.ground)
+        print()
+        print(team_1, round(chances, 3), '-', team_2, round(1 - chances, 3),
+              '(home team: ' + str(elo.home_team(args.ground)) + ')' if args.ground is not None else '')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+This script provides interchangeable backends extracting the details of ESPN CricInfo webpages
+from their raw HTML. The 'bs4' backend builds a full BeautifulSoup tree and uses the functions of
+scrapper.py, the 'lxml' backend only visits the few nodes each page type needs with lxml XPath
+and produces identical output.
+"""
+
+import re
+import time
+from functools import partial
+import pandas as pd
+from bs4 import BeautifulSoup
+from lxml import html as lxml_html
+
+from scrapper import (get_odi_match_results, get_scorecard_details, get_scorecard_stats, get_player_profile,
+                      match_results_dataframe, stats_table, odi_figures, scorecard_number, overs_to_balls, is_dismissed)
+from metrics import inc, observe, timer
+from fragments import with_class
+
+BACKENDS = ['bs4', 'lxml']
+PAGE_TYPES = ['results', 'scorecard', 'scorecard_stats', 'player']
+
+def lxml_odi_match_results(html):
+    """
+    Given the raw HTML of ODI match results, get a dataframe of teams, winner, margin, ground and scorecard.
+
+    Keyword:
+        html: (str) ODI match results HTML
+
+    Return:
+        matches: (Dataframe) With teams, winner, margin, ground, ground URL, match date, scorecard and scorecard URL.
+    """
+
+    tree = lxml_html.document_fromstring(html)
+
+    l = []
+    for table in tree.iter('tbody'):
+        for tr in table.iter('tr'):
+            row = []
+            for cell in tr.iter('td'):
+                row.append(cell.text_content())
+                # Obtain Ground and Scorecard URLs
+                a = next(cell.iter('a'), None)
+                if a is None:
+                    continue
+                if 'ground' in a.attrib['href']: row.append('http://stats.espncricinfo.com' + a.attrib['href'])
+                if 'match' in a.attrib['href']: row.append('http://stats.espncricinfo.com' + a.attrib['href'])
+            l.append(row)
+
+    return match_results_dataframe(l)
+
+def lxml_scorecard_details(html):
+    """
+    Given the raw HTML of ODI match scorecard, get all the relevant information including players in a list format
+
+    Keyword:
+        html: (str) ODI match scorecard HTML
+
+    Return:
+        details: (list) comprising of World Cup Match (boolean), Attendence (int), players' names (str) and urls(str)
+    """
+
+    tree = lxml_html.document_fromstring(html)
+    details = []
+
+    # World cup match or not?
+    overview = tree.xpath('//div[' + with_class('cscore_info-overview') + ']')[0]
+    details.append('World Cup' in overview.text_content())
+
+    # Getting attendence
+    attendance = None
+    for div in tree.xpath('//div[normalize-space(@class)="accordion-content collapse in"]'):
+        for li in div.iter('li'):
+            text = li.text_content()
+            if 'Attendance' in text:
+                # Taking out match revenue detailed added to attendance with paranthesis
+                if "(" in text:
+                    attendance = int(''.join(re.findall(r'\s(\d.*)\s\(', text)).replace(',','').replace(' ',''))
+                else:
+                    attendance = int(''.join(re.findall(r'\d+', text)))
+    details.append(attendance)
+
+    # Getting players
+    for li in tree.xpath('//li[' + with_class('accordion-item') + ']'):
+        h2 = next(li.iter('h2'), None)
+        if h2 is None:
+            continue
+        players = [h2.text_content().replace(' Innings','')]
+        for div in li.xpath('.//div[normalize-space(@class)="scorecard-section batsmen"]'):
+            for a in div.iter('a'):
+                href = a.get('href')
+                if href is not None and ('player' in href) & (href[-4:]=='html'):
+                    players.append(a.text_content().replace(" †","").replace(" (c)",""))
+                    players.append(href)
+        while len(players) < 25: players.append(None)
+        details = details + players
+
+    return details
+
+def lxml_scorecard_stats(html):
+    """
+    Given the raw HTML of ODI match scorecard, get the batting and bowling figures of every player
+
+    Keyword:
+        html: (str) ODI match scorecard HTML
+
+    Return:
+        stats: (list) of [player url, 'bat', runs, balls faced, dismissed] and [player url, 'bowl', runs conceded, balls bowled, wickets]
+    """
+
+    tree = lxml_html.document_fromstring(html)
+
+    stats = []
+    for li in tree.xpath('//li[' + with_class('accordion-item') + ']'):
+        for div in li.xpath('.//div[normalize-space(@class)="scorecard-section batsmen"]'):
+            for row in div.xpath('.//div[normalize-space(@class)="wrap batsmen"]'):
+                cell = row.xpath('.//div[normalize-space(@class)="cell batsmen"]')
+                a = None if len(cell) == 0 else next(cell[0].iter('a'), None)
+                if a is None or 'player' not in a.get('href', ''):
+                    continue
+                runs = [scorecard_number(cell.text_content()) for cell in row.xpath('.//div[normalize-space(@class)="cell runs"]')]
+                commentary = row.xpath('.//div[normalize-space(@class)="cell commentary"]')
+                dismissed = len(commentary) > 0 and is_dismissed(commentary[0].text_content())
+                if len(runs) > 1:
+                    stats.append([a.get('href'), 'bat', runs[0], runs[1], int(dismissed)])
+
+        for div in li.xpath('.//div[normalize-space(@class)="scorecard-section bowling"]'):
+            for table in div.iter('table'):
+                head = [th.text_content().strip() for th in table.iter('th')]
+                if not ('O' in head and 'R' in head and 'W' in head):
+                    continue
+                for tr in table.iter('tr'):
+                    td = list(tr.iter('td'))
+                    a = next(tr.iter('a'), None)
+                    if a is None or len(td) < len(head) or 'player' not in a.get('href', ''):
+                        continue
+                    figures = [scorecard_number(td[head.index(column)].text_content()) for column in ['R', 'O', 'W']]
+                    stats.append([a.get('href'), 'bowl', figures[0], overs_to_balls(figures[1]), figures[2]])
+
+    return stats
+
+def lxml_player_profile(html):
+    """
+    Given the raw HTML of an ODI cricket player, get the relevant batting and bowling details
+    that do not change from match to match, including Date of Birth.
+
+    Keyword:
+        html: (str) ODI cricket player HTML
+
+    Return:
+        profile: (list) Date of Birth, styles, batting and bowling details.
+    """
+
+    tree = lxml_html.document_fromstring(html)
+
+    dob = None
+    style = None
+    batting_style = None
+    bowling_style = None
+
+    for p in tree.xpath('//p[' + with_class('ciPlayerinformationtxt') + ']'):
+        text = p.text_content()
+        if text[:4] == 'Born':
+            dob = pd.to_datetime(re.search(r'\w{3,9}?\s\d{1,2}?,\s\d{4}?', text).group(0))
+        elif text[:4] in ('Play', 'Batt', 'Bowl'):
+            span = next(p.iter('span')).text_content()
+            if text[:4] == 'Play': style = span
+            if text[:4] == 'Batt': batting_style = span
+            if text[:4] == 'Bowl': bowling_style = span
+
+    tables = []
+    for table in tree.xpath('//table[' + with_class('engineTable') + ']')[:2]:
+        for tr in table.xpath('.//tr[' + with_class('head') + ']'):
+            head = [th.text_content() for th in tr.iter('th')]
+        rows = [[td.text_content() for td in tr.iter('td')] for tr in table.iter('tr')]
+        tables.append(stats_table(head, rows))
+    batting = tables[0] if len(tables) > 0 else None
+    bowling = tables[1] if len(tables) > 1 else None
+
+    bat_ave, bat_sr, bowl_ave, bowl_econ, bowl_sr = odi_figures(batting, bowling)
+
+    return [dob, style, batting_style, bowling_style, bat_ave, bat_sr, bowl_ave, bowl_econ, bowl_sr]
+
+EXTRACTORS = {
+    'bs4': {
+        'results': lambda html: get_odi_match_results(BeautifulSoup(html, "html.parser")),
+        'scorecard': lambda html: get_scorecard_details(BeautifulSoup(html, "html.parser")),
+        'scorecard_stats': lambda html: get_scorecard_stats(BeautifulSoup(html, "html.parser")),
+        'player': lambda html: get_player_profile(BeautifulSoup(html, "html.parser")),
+    },
+    'lxml': {
+        'results': lxml_odi_match_results,
+        'scorecard': lxml_scorecard_details,
+        'scorecard_stats': lxml_scorecard_stats,
+        'player': lxml_player_profile,
+    },
+}
+
+def extract(page_type, html, backend='bs4'):
+    """
+    Given the raw HTML of a webpage, extract its details with the chosen backend.
+
+    Keyword:
+        page_type: (str) 'results', 'scorecard', 'scorecard_stats' or 'player'
+        html: (str) HTML of the webpage
+        backend: (str) 'bs4' or 'lxml'
+
+    Return:
+        details: same as get_odi_match_results, get_scorecard_details, get_scorecard_stats or get_player_profile respectively
+    """
+
+    with timer('parse_seconds', page_type=page_type, backend=backend):
+        details = EXTRACTORS[backend][page_type](html)
+    inc('pages_parsed_total', page_type=page_type, backend=backend)
+
+    return details
+
+def parse_scorecard(html, backend='bs4', page_type='scorecard'):
+    """
+    Given the raw HTML of an ODI match scorecard, get its details. Runs in the worker processes of parse_scorecards.
+
+    Keyword:
+        html: (str) ODI match scorecard HTML
+        backend: (str) 'bs4' or 'lxml'
+        page_type: (str) 'scorecard' for the players, 'scorecard_stats' for their batting and bowling figures
+
+    Return:
+        details: (list) as returned by get_scorecard_details (or get_scorecard_stats), empty if the scorecard could not be scraped
+    """
+
+    if html is None:
+        return []
+    return extract(page_type, html, backend)
+
+def parse_scorecards(htmls, pool=None, backend='bs4', chunksize=8, page_type='scorecard'):
+    """
+    Given a batch of raw scorecard HTML, get the details of every scorecard in the same order.
+
+    Keyword:
+        htmls: (list) ODI match scorecard HTML
+        pool: (concurrent.futures.ProcessPoolExecutor) worker processes to parse with, parsing serially when None
+        backend: (str) 'bs4' or 'lxml'
+        chunksize: (int) scorecards sent to a worker process at a time
+        page_type: (str) 'scorecard' for the players, 'scorecard_stats' for their batting and bowling figures
+
+    Return:
+        scorecards: (list) details of each scorecard as returned by get_scorecard_details (or get_scorecard_stats)
+    """
+
+    if pool is None:
+        return [parse_scorecard(html, backend, page_type) for html in htmls]
+
+    # Measurements of the worker processes stay there, so the batch is recorded as a whole
+    start = time.perf_counter()
+    scorecards = list(pool.map(partial(parse_scorecard, backend=backend, page_type=page_type), htmls, chunksize=chunksize))
+    inc('pages_parsed_total', sum(html is not None for html in htmls), page_type=page_type, backend=backend)
+    observe('parse_batch_seconds', time.perf_counter() - start, page_type=page_type, backend=backend)
+
+    return scorecards
@@ -0,0 +1,63 @@
+"""
+This script cuts ESPN CricInfo webpages down to the few DOM fragments the extractors read, dropping
+headers, scripts, ads and navigation. Both extractor backends give the same details on a fragment
+as on the whole webpage, at a fraction of the size.
+"""
+
+from lxml import html as lxml_html
+
+# Bumped whenever the fragments kept change, so that archived fragments are cut again or re-fetched
+FRAGMENT_VERSION = 1
+
+def with_class(name):
+    """
+    XPath predicate matching elements that have a class, like BeautifulSoup's {"class": name}
+    """
+    return 'contains(concat(" ", normalize-space(@class), " "), " ' + name + ' ")'
+
+# Elements read by the extractors of each page type, see extractors.py
+FRAGMENT_XPATHS = {
+    'results': ['//table[tbody]'],
+    'scorecard': ['//div[' + with_class('cscore_info-overview') + ']',
+                  '//div[normalize-space(@class)="accordion-content collapse in"]',
+                  '//li[' + with_class('accordion-item') + ']'],
+    'player': ['//p[' + with_class('ciPlayerinformationtxt') + ']',
+               '(//table[' + with_class('engineTable') + '])[position() <= 2]'],
+}
+
+def page_type(url):
+    """
+    Given a URL, return the extractor page type it needs, None for pages that are not parsed
+    """
+    if 'match_results.html' in url:
+        return 'results'
+    if '/engine/match/' in url:
+        return 'scorecard'
+    if 'player' in url:
+        return 'player'
+    return None
+
+def page_fragment(url, html):
+    """
+    Given a webpage, keep only the elements its extractor reads, in document order
+
+    Keywords:
+        url: (str) url of webpage
+        html: (str) HTML of the webpage
+
+    Return
+        fragment: (str) HTML of the kept elements, the whole webpage for pages that are not parsed
+    """
+    kind = page_type(url)
+    if kind is None:
+        return html
+
+    tree = lxml_html.document_fromstring(html)
+    # A union of XPaths is in document order
+    nodes = tree.xpath(' | '.join(FRAGMENT_XPATHS[kind]))
+    kept = set(nodes)
+    # Elements within a kept element are already part of it
+    nodes = [node for node in nodes if not any(ancestor in kept for ancestor in node.iterancestors())]
+
+    return '<html><body>' + ''.join(lxml_html.tostring(node, encoding='unicode', with_tail=False)
+                                    for node in nodes) + '</body></html>'
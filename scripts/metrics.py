@@ -0,0 +1,243 @@
+"""
+This script records where the time of a data.py run goes: counters (webpages fetched, retries,
+archive hits and misses, pages parsed, rows produced) and histograms (fetch latency, throttling
+waits, parse and stage durations), reported as JSON or in the Prometheus text format at the end of
+a run. Stages can also be profiled with cProfile.
+
+Usage: python data.py 2018 2019 --metrics ../data/metrics.prom --profile scorecards
+"""
+
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+PREFIX = 'odi_'
+# Upper bounds in seconds, from archive lookups to slow webservers
+BUCKETS = [.001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60, float('inf')]
+
+# One registry per process, shared by scraping threads
+_counters = {}
+_histograms = {}
+_lock = threading.Lock()
+_profiling = {'stages': set(), 'directory': '.', 'active': False}
+
+def labels_key(labels):
+    """
+    Given labels as keywords, return a hashable key, the same whatever the order of the keywords
+    """
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+def inc(name, value=1, **labels):
+    """
+    Add to a counter
+
+    Keywords:
+        name: (str) name of the counter, e.g. 'fetch_retries_total'
+        value: (float) amount added
+        labels: (str) labels of the counter, e.g. page_type='scorecard'
+    """
+    key = (name, labels_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def observe(name, value, **labels):
+    """
+    Record a measurement, usually a duration in seconds, in a histogram
+
+    Keywords:
+        name: (str) name of the histogram, e.g. 'fetch_seconds'
+        value: (float) measurement
+        labels: (str) labels of the histogram, e.g. stage='scorecards'
+    """
+    key = (name, labels_key(labels))
+    with _lock:
+        if key not in _histograms:
+            _histograms[key] = {'buckets': [0] * len(BUCKETS), 'sum': 0.0, 'count': 0}
+        histogram = _histograms[key]
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                histogram['buckets'][i] += 1
+                break
+        histogram['sum'] += value
+        histogram['count'] += 1
+
+@contextmanager
+def timer(name, **labels):
+    """
+    Time the enclosed block into a histogram
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+def enable_profiling(stages, directory='.'):
+    """
+    Profile the given stages with cProfile, each saving its statistics to <directory>/<stage>.prof
+
+    Keywords:
+        stages: (list) names of the stages to profile, 'all' for every stage
+        directory: (str) where to save the profiles, readable with pstats or snakeviz
+    """
+    _profiling['stages'] = set(stages)
+    _profiling['directory'] = directory
+
+def stage(name):
+    """
+    Decorator recording the duration of a pipeline stage and the number of rows it produced,
+    profiling it when asked to by enable_profiling
+
+    Keywords:
+        name: (str) name of the stage, e.g. 'match_results'
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            profiler = None
+            # A stage running within a profiled stage shows up in the outer profile
+            if (name in _profiling['stages'] or 'all' in _profiling['stages']) and not _profiling['active']:
+                profiler = cProfile.Profile()
+                profiler.enable()
+                _profiling['active'] = True
+            start = time.perf_counter()
+            try:
+                result = function(*args, **kwargs)
+            finally:
+                observe('stage_seconds', time.perf_counter() - start, stage=name)
+                if profiler is not None:
+                    profiler.disable()
+                    _profiling['active'] = False
+                    profiler.dump_stats(os.path.join(_profiling['directory'], name + '.prof'))
+            if hasattr(result, '__len__'):
+                inc('rows_produced_total', len(result), stage=name)
+            return result
+        return wrapper
+    return decorator
+
+def reset():
+    """
+    Forget every measurement recorded so far
+    """
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+def counter_value(name, **labels):
+    """
+    Return the value of a counter, summed over the labels not given
+    """
+    wanted = set(labels_key(labels))
+    with _lock:
+        return sum(value for (key, key_labels), value in _counters.items()
+                   if key == name and wanted <= set(key_labels))
+
+def histogram_sum(name, **labels):
+    """
+    Return the sum of the measurements of a histogram, over the labels not given
+    """
+    wanted = set(labels_key(labels))
+    with _lock:
+        return sum(histogram['sum'] for (key, key_labels), histogram in _histograms.items()
+                   if key == name and wanted <= set(key_labels))
+
+def throughput():
+    """
+    Derive rates from the recorded measurements
+
+    Return
+        rates: (dict) archive hit rate, and webpages parsed and rows produced per second
+    """
+    rates = {}
+    hits = counter_value('archive_lookups_total', result='hit')
+    lookups = counter_value('archive_lookups_total')
+    if lookups > 0:
+        rates['archive_hit_rate'] = hits / lookups
+
+    page_types = {dict(labels).get('page_type') for name, labels in list(_counters) if name == 'pages_parsed_total'}
+    for page_type in sorted(page_types):
+        elapsed = histogram_sum('parse_seconds', page_type=page_type) + histogram_sum('parse_batch_seconds', page_type=page_type)
+        if elapsed > 0:
+            rates['pages_parsed_per_second{page_type="' + page_type + '"}'] = counter_value('pages_parsed_total', page_type=page_type) / elapsed
+
+    stages = {dict(labels).get('stage') for name, labels in list(_histograms) if name == 'stage_seconds'}
+    for name in sorted(stages):
+        elapsed = histogram_sum('stage_seconds', stage=name)
+        if elapsed > 0:
+            rates['rows_per_second{stage="' + name + '"}'] = counter_value('rows_produced_total', stage=name) / elapsed
+
+    return rates
+
+def format_labels(labels, extra=()):
+    """
+    Format labels the Prometheus way, e.g. {stage="scorecards",le="0.5"}
+    """
+    labels = list(labels) + list(extra)
+    if len(labels) == 0:
+        return ''
+    return '{' + ','.join(key + '="' + value + '"' for key, value in labels) + '}'
+
+def report(report_format='json'):
+    """
+    Report every measurement recorded so far
+
+    Keywords:
+        report_format: (str) 'json', or 'prometheus' for the Prometheus text exposition format
+
+    Return
+        report: (str) counters, histograms and derived rates
+    """
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((key, dict(value, buckets=list(value['buckets']))) for key, value in _histograms.items())
+
+    if report_format == 'prometheus':
+        lines = []
+        for i, ((name, labels), value) in enumerate(counters):
+            if i == 0 or counters[i-1][0][0] != name:
+                lines.append('# TYPE ' + PREFIX + name + ' counter')
+            lines.append(PREFIX + name + format_labels(labels) + ' ' + repr(float(value)))
+        for i, ((name, labels), histogram) in enumerate(histograms):
+            if i == 0 or histograms[i-1][0][0] != name:
+                lines.append('# TYPE ' + PREFIX + name + ' histogram')
+            cumulative = 0
+            for bound, count in zip(BUCKETS, histogram['buckets']):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(PREFIX + name + '_bucket' + format_labels(labels, [('le', le)]) + ' ' + str(cumulative))
+            lines.append(PREFIX + name + '_sum' + format_labels(labels) + ' ' + repr(histogram['sum']))
+            lines.append(PREFIX + name + '_count' + format_labels(labels) + ' ' + str(histogram['count']))
+        metric = None
+        for name, value in throughput().items():
+            if name.split('{')[0] != metric:
+                metric = name.split('{')[0]
+                lines.append('# TYPE ' + PREFIX + metric + ' gauge')
+            lines.append(PREFIX + name + ' ' + repr(float(value)))
+        return '\n'.join(lines) + '\n'
+
+    summary = {'counters': {}, 'histograms': {}, 'throughput': throughput()}
+    for (name, labels), value in counters:
+        summary['counters'].setdefault(name, []).append({'labels': dict(labels), 'value': value})
+    for (name, labels), histogram in histograms:
+        summary['histograms'].setdefault(name, []).append({
+            'labels': dict(labels), 'count': histogram['count'], 'sum': histogram['sum'],
+            'mean': histogram['sum'] / histogram['count'] if histogram['count'] > 0 else None,
+            'buckets': {('+Inf' if bound == float('inf') else str(bound)): count
+                        for bound, count in zip(BUCKETS, histogram['buckets'])}})
+    return json.dumps(summary, indent=2)
+
+def write_report(path):
+    """
+    Save the report of every measurement, in the Prometheus text format when the file ends with .prom
+    or .txt and as JSON otherwise
+
+    Keywords:
+        path: (str) location of the report
+    """
+    report_format = 'prometheus' if path.endswith(('.prom', '.txt')) else 'json'
+    with open(path, 'w') as f:
+        f.write(report(report_format))
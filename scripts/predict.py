@@ -0,0 +1,243 @@
+"""
+This script predicts the outcome of ODI matches from the squads of both teams, using a scaler and
+classifier trained on the batting and bowling statistics of matches_scorecard_player_details.csv.
+The model is loaded once, and squads are looked up in complete_player_details.csv, so thousands of
+fixtures are scored in one vectorized batch.
+
+Dependencies: argparse, numpy, pandas and sklearn
+
+Usage: python predict.py England India
+       python predict.py --all (every fixture between the teams in complete_player_details.csv)
+"""
+
+import argparse
+import itertools
+import pickle
+import time
+import numpy as np
+import pandas as pd
+
+from storage import read_table, table_exists
+
+MODEL_PATH = '../data/model.pkl'
+STATS = ['bat_ave', 'bat_sr', 'bowl_ave', 'bowl_econ', 'bowl_sr']
+SQUAD_SIZE = 12
+
+def feature_columns():
+    """
+    Return the columns of matches_scorecard_player_details.csv the models are trained on, in order
+
+    Return
+        columns: (list) batting and bowling statistics of every player slot of both teams
+    """
+    return ['team_' + str(team) + '_player_' + str(player) + '_' + stat
+            for team in range(1,3) for player in range(1, SQUAD_SIZE+1) for stat in STATS]
+
+def fill_values(X):
+    """
+    Given the training features, get the value standing in for a missing player in each column,
+    following the same rules as the imputation of data.py
+
+    Keywords:
+        X: (pandas.Dataframe) training features with the columns of feature_columns()
+
+    Return
+        fill: (pandas.Series) worst value of each column, highest for bowling and lowest after 0 for batting
+    """
+    fill = {}
+    for c in X.columns:
+        if 'bowl' in c:
+            fill[c] = X[c].max()
+        else:
+            fill[c] = X[c][X[c]>0].min()
+
+    return pd.Series(fill)[X.columns]
+
+def save_model(scaler, model, X, path=MODEL_PATH):
+    """
+    Serialize a fitted scaler and classifier for predictions
+
+    Keywords:
+        scaler: (sklearn.preprocessing.StandardScaler) scaler fitted on the training features
+        model: (sklearn classifier) classifier fitted on the scaled training features
+        X: (pandas.Dataframe) unscaled training features with the columns of feature_columns()
+        path: (str) location of the serialized model
+    """
+    with open(path, 'wb') as f:
+        pickle.dump({'scaler': scaler, 'model': model, 'features': list(X.columns), 'fill': fill_values(X)}, f)
+
+def latest_squads(matches_scorecard):
+    """
+    Given the scorecards of played matches, get the players of every team in its latest match, in batting order
+
+    Keywords:
+        matches_scorecard: (pandas.Dataframe) match date, teams and player URLs as in matches_scorecard_details
+
+    Return
+        squads: (dict) player URLs of every team in batting order, empty slots left out
+    """
+    sides = []
+    for team in range(1,3):
+        urls = ['team_' + str(team) + '_player_' + str(player) + '_url' for player in range(1, SQUAD_SIZE+1)]
+        side = matches_scorecard[['match_date', 'team_' + str(team)] + urls]
+        side.columns = ['match_date', 'team'] + list(range(SQUAD_SIZE))
+        sides.append(side)
+    sides = pd.concat(sides, ignore_index=True)
+    sides['match_date'] = pd.to_datetime(sides['match_date'])
+    # Same day matches keep the order of the scorecards
+    latest = sides.sort_values('match_date', kind='mergesort').drop_duplicates('team', keep='last')
+
+    return {row[0]: [url for url in row[1:] if isinstance(url, str)]
+            for row in latest[['team'] + list(range(SQUAD_SIZE))].itertuples(index=False)}
+
+class MatchPredictor:
+    """
+    Scores fixtures between squads with a serialized scaler and classifier
+
+    Keywords:
+        model_path: (str) location of the model serialized by save_model
+        players: (pandas.Dataframe) compiled table of each team's players, by default complete_player_details
+        matches_scorecard: (pandas.Dataframe) scorecards the default squads are taken from, by default
+                           matches_scorecard_details when it is saved
+    """
+
+    def __init__(self, model_path=MODEL_PATH, players=None, matches_scorecard=None):
+        with open(model_path, 'rb') as f:
+            bundle = pickle.load(f)
+        self.scaler = bundle['scaler']
+        self.model = bundle['model']
+        self.features = bundle['features']
+        if self.features != feature_columns():
+            raise ValueError('The model at ' + model_path + ' was trained on other features than feature_columns(), '
+                             'retrain it with train.py')
+        self.fill = bundle['fill'].to_numpy(dtype=float)
+        self.classes = list(self.model.classes_)
+
+        if players is None:
+            players = read_table('complete_player_details', ['team', 'name', 'url'] + STATS)
+        players = players.astype({'team': object, 'name': object, 'url': object})
+        self.players = players
+        self.teams = list(pd.unique(players['team']))
+
+        # Default squads: every team's players in its latest match, in batting order as the model was trained
+        if matches_scorecard is None and table_exists('matches_scorecard_details'):
+            columns = ['match_date', 'team_1', 'team_2'] + ['team_' + str(team) + '_player_' + str(player) + '_url'
+                                                            for team in range(1,3) for player in range(1, SQUAD_SIZE+1)]
+            matches_scorecard = read_table('matches_scorecard_details', columns, typed=False)
+        self.squads = {}
+        if matches_scorecard is not None:
+            for team, urls in latest_squads(matches_scorecard).items():
+                self.set_squad(team, urls)
+        missing = [team for team in self.teams if team not in self.squads]
+        if len(missing) > 0:
+            print('No scorecards for', len(missing), 'teams, their squads follow the order of complete_player_details '
+                  'rather than batting order. Save matches_scorecard_details with data.py, or pick squads with set_squad.')
+        for team, group in players[players['team'].isin(missing)].drop_duplicates(['team', 'url']).groupby('team', sort=False):
+            self.squads[team] = self.squad_stats(group.head(SQUAD_SIZE))
+
+    def squad_stats(self, squad):
+        """
+        Given the players of a squad, get their statistics in batting order
+
+        Keywords:
+            squad: (pandas.Dataframe) rows of the players table, in batting order
+
+        Return
+            stats: (numpy.ndarray) SQUAD_SIZE x 5 array of batting and bowling statistics, missing players as NaN
+        """
+        stats = np.full((SQUAD_SIZE, len(STATS)), np.nan)
+        values = squad[STATS].to_numpy(dtype=float)[:SQUAD_SIZE]
+        stats[:len(values)] = values
+
+        return stats
+
+    def set_squad(self, team, urls):
+        """
+        Pick the squad of a team instead of its most recent players
+
+        Keywords:
+            team: (str) name of the team
+            urls: (list) player URLs in batting order
+        """
+        # A player's figures for this team are preferred over those for any other team they played for,
+        # players without any are missing
+        players = self.players.sort_values('team', key=lambda teams: teams != team, kind='mergesort')
+        players = players.drop_duplicates('url').set_index('url')
+        self.squads[team] = self.squad_stats(players.reindex(list(urls)))
+        if team not in self.teams:
+            self.teams.append(team)
+
+    def predict(self, fixtures, symmetric=True):
+        """
+        Score a batch of fixtures in one go
+
+        Keywords:
+            fixtures: (list) (team_1, team_2) pairs, team_1 batting first
+            symmetric: (bool) averaging over both teams batting first
+
+        Return
+            predictions: (pandas.Dataframe) team_1, team_2 and the probability of each outcome
+        """
+        fixtures = list(fixtures)
+        index = {team: i for i, team in enumerate(self.squads)}
+        squads = np.stack([stats.ravel() for stats in self.squads.values()])
+        first = np.array([index[a] for a, b in fixtures])
+        second = np.array([index[b] for a, b in fixtures])
+
+        proba = self.outcome_proba(squads, first, second)
+        if symmetric == True:
+            swapped = self.outcome_proba(squads, second, first)
+            proba = (proba + swapped[:, [1, 0, 2]]) / 2
+
+        predictions = pd.DataFrame({'team_1': [a for a, b in fixtures], 'team_2': [b for a, b in fixtures],
+                                    'team_1_win': proba[:, 0], 'team_2_win': proba[:, 1], 'tied': proba[:, 2]})
+        predictions['predicted_winner'] = np.where(proba[:, 0] >= proba[:, 1], predictions['team_1'], predictions['team_2'])
+
+        return predictions
+
+    def outcome_proba(self, squads, first, second):
+        """
+        Probabilities of team_1, team_2 and tied for fixtures given as rows of the squads array
+        """
+        X = np.hstack([squads[first], squads[second]])
+        X = np.where(np.isnan(X) | (X == 0), self.fill, X)
+        if hasattr(self.scaler, 'feature_names_in_'):
+            X = pd.DataFrame(X, columns=self.features)
+        X = self.scaler.transform(X)
+        proba = np.zeros((len(X), 3))
+        if hasattr(self.model, 'predict_proba'):
+            scores = self.model.predict_proba(X)
+            for column, outcome in enumerate(['team_1', 'team_2', 'tied']):
+                if outcome in self.classes:
+                    proba[:, column] = scores[:, self.classes.index(outcome)]
+        else:
+            # Classifiers without probabilities, e.g. SVC(probability=False), vote for a single outcome
+            predicted = self.model.predict(X)
+            for column, outcome in enumerate(['team_1', 'team_2', 'tied']):
+                proba[:, column] = predicted == outcome
+
+        return proba
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('teams', nargs='*', help='teams to predict, every pair of them is scored')
+    parser.add_argument('--all', action='store_true', help='score every fixture between all teams')
+    parser.add_argument('--model', default=MODEL_PATH, help='model serialized by save_model')
+    parser.add_argument('--output', default=None, help='CSV file to save the predictions to')
+    args = parser.parse_args()
+
+    predictor = MatchPredictor(args.model)
+    teams = predictor.teams if args.all else args.teams
+
+    start = time.perf_counter()
+    predictions = predictor.predict(itertools.permutations(teams, 2))
+    elapsed = time.perf_counter() - start
+
+    if args.output is not None:
+        predictions.to_csv(args.output, index=False)
+    else:
+        print(predictions.to_string(index=False))
+    print('Scored', len(predictions), 'fixtures in', round(elapsed * 1000, 1), 'ms')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+This script keeps the parsed profile of every ODI cricket player in a cache keyed by player URL,
+so that each player's webpage is parsed once however many matches they played.
+"""
+
+import json
+import sqlite3
+from collections import OrderedDict
+import pandas as pd
+
+PROFILES_PATH = '../data/archive/profiles.db'
+PROFILE_COLUMNS = ['dob', 'style', 'batting_style', 'bowling_style', 'bat_ave', 'bat_sr', 'bowl_ave', 'bowl_econ', 'bowl_sr']
+
+class PlayerProfileCache:
+    """
+    Least recently used cache of player profiles (see scrapper.get_player_profile), optionally persisted on disk.
+    A profile of None records a webpage that could not be parsed, so it is not parsed again either.
+
+    Keywords:
+        maxsize: (int) number of profiles kept in memory
+        path: (str) location of the SQLite file persisting profiles, None to keep them in memory only
+    """
+
+    def __init__(self, maxsize=4096, path=None):
+        self.maxsize = maxsize
+        self.profiles = OrderedDict()
+        self.connection = None
+        if path is not None:
+            self.connection = sqlite3.connect(path)
+            self.connection.execute('CREATE TABLE IF NOT EXISTS profiles (url TEXT PRIMARY KEY, profile TEXT)')
+            self.connection.commit()
+
+    def __contains__(self, url):
+        if url in self.profiles:
+            return True
+        if self.connection is not None:
+            return self.connection.execute('SELECT 1 FROM profiles WHERE url = ?', (url,)).fetchone() is not None
+        return False
+
+    def get(self, url):
+        """
+        Given a player URL, return the cached profile.
+
+        Keywords:
+            url: (str) url of the player's webpage
+
+        Return
+            profile: (list) Date of Birth, styles, batting and bowling details, None if the webpage could not be parsed
+        """
+
+        if url in self.profiles:
+            self.profiles.move_to_end(url)
+            return self.profiles[url]
+
+        row = None
+        if self.connection is not None:
+            row = self.connection.execute('SELECT profile FROM profiles WHERE url = ?', (url,)).fetchone()
+        if row is None:
+            raise KeyError(url)
+
+        profile = json.loads(row[0])
+        if profile is not None and profile[0] is not None:
+            profile[0] = pd.Timestamp(profile[0])
+        self._remember(url, profile)
+        return profile
+
+    def put(self, url, profile):
+        """
+        Cache the profile of a player.
+
+        Keywords:
+            url: (str) url of the player's webpage
+            profile: (list) Date of Birth, styles, batting and bowling details, None if the webpage could not be parsed
+        """
+
+        self._remember(url, profile)
+        if self.connection is not None:
+            stored = None if profile is None else [None if profile[0] is None else str(profile[0])] + profile[1:]
+            with self.connection:
+                self.connection.execute('INSERT OR REPLACE INTO profiles VALUES (?, ?)', (url, json.dumps(stored)))
+
+    def _remember(self, url, profile):
+        self.profiles[url] = profile
+        self.profiles.move_to_end(url)
+        while len(self.profiles) > self.maxsize:
+            self.profiles.popitem(last=False)
+
+def profiles_dataframe(cache, urls):
+    """
+    Given a cache and a list of player URLs, tabulate their profiles. Players that could not be fetched or parsed have missing values.
+
+    Keywords:
+        cache: (PlayerProfileCache) cache holding the profiles of the players
+        urls: (list) urls of the players' webpages
+
+    Return
+        profiles: (pandas.Dataframe) one row of profile details per URL, indexed by URL
+    """
+
+    rows = []
+    for url in urls:
+        profile = cache.get(url) if url in cache else None
+        rows.append([None] * len(PROFILE_COLUMNS) if profile is None else profile)
+    profiles = pd.DataFrame(rows, columns=PROFILE_COLUMNS, index=pd.Index(urls, name='url'))
+    profiles['dob'] = pd.to_datetime(profiles['dob'])
+
+    return profiles
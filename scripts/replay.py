@@ -0,0 +1,198 @@
+"""
+This script stands in for ESPN CricInfo offline: a local HTTP server replaying the webpages of an archive,
+so the scraping code can be exercised and benchmarked without hitting the website. It can misbehave
+like the website does, on purpose: slow responses, "Page error" pages, "Bad Gateway" errors, and
+429 Too Many Requests when requests come in faster than it allows.
+
+The server is used as an HTTP proxy, so the scraper needs no change: with HTTP_PROXY pointing at it, the
+requests for http://stats.espncricinfo.com/... and http://www.espncricinfo.com/... go to the server instead.
+
+Dependencies: argparse
+
+Usage: python replay.py --port 8800 --latency 0.05 --error-rate 0.05 --rate-limit 20
+       HTTP_PROXY=http://127.0.0.1:8800 python data.py 2018 2019 (in another shell)
+"""
+
+import argparse
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from archive import archive_get, ARCHIVE_PATH
+from scrapper import TokenBucket
+
+PAGE_ERROR = '<html><body><p>Page error</p><p>The page you requested could not be found.</p></body></html>'
+BAD_GATEWAY = '<html><body><h1>502 Bad Gateway</h1></body></html>'
+TOO_MANY_REQUESTS = '<html><body><h1>429 Too Many Requests</h1></body></html>'
+OUTCOMES = ['served', 'missing', 'page_error', 'bad_gateway', 'rate_limited']
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    """
+    Answers every GET request from the archive of the ReplayServer it belongs to
+    """
+
+    # Keeping connections alive, as the scraper's pooled sessions expect
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        # Proxied requests carry the whole URL, direct ones only the path
+        url = self.path if self.path.startswith('http') else 'http://' + self.headers.get('Host', '') + self.path
+        status, html, headers = self.server.replay.respond(url)
+
+        body = html.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Outcomes are counted instead of logging every request
+        pass
+
+class ReplayServer:
+    """
+    Local HTTP server replaying archived webpages, with injectable latency and faults
+
+    Keywords:
+        source: (str) location of the SQLite archive the webpages are served from
+        host: (str) interface to listen on
+        port: (int) port to listen on, any free port when 0
+        latency: (float) seconds every response is delayed by
+        jitter: (float) up to this many more seconds of random delay
+        error_rate: (float) share of responses that are a "Page error" webpage
+        bad_gateway_rate: (float) share of responses that are a 502 Bad Gateway
+        rate_limit: (float) requests per second allowed to each host, answered with 429 beyond it, no limit when None
+        burst: (int) requests allowed back-to-back before the rate limit applies
+        seed: (int) seed of the random delays and faults
+    """
+
+    def __init__(self, source=ARCHIVE_PATH, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, error_rate=0.0,
+                 bad_gateway_rate=0.0, rate_limit=None, burst=1, seed=None):
+        self.source = source
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.bad_gateway_rate = bad_gateway_rate
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self.random = random.Random(seed)
+        self.buckets = {}
+        self.counts = dict.fromkeys(OUTCOMES, 0)
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+        self.httpd = ThreadingHTTPServer((host, port), ReplayHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.replay = self
+        self.thread = None
+
+    @property
+    def url(self):
+        """
+        URL of the server, to set HTTP_PROXY to
+        """
+        host, port = self.httpd.server_address[:2]
+        return 'http://' + host + ':' + str(port)
+
+    def respond(self, url):
+        """
+        Given a requested URL, decide the response the way the website might
+
+        Return
+            status: (int) HTTP status
+            html: (str) body of the response
+            headers: (dict) extra headers of the response
+        """
+        host = url.split('/')[2] if url.count('/') >= 2 else ''
+        with self.lock:
+            if self.rate_limit is not None and host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.rate_limit, self.burst)
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            draw = self.random.random()
+        time.sleep(delay)
+
+        if self.rate_limit is not None:
+            wait = self.buckets[host].try_acquire()
+            if wait > 0:
+                return self.record('rate_limited', 429, TOO_MANY_REQUESTS, {'Retry-After': str(max(1, round(wait)))})
+        if draw < self.bad_gateway_rate:
+            return self.record('bad_gateway', 502, BAD_GATEWAY)
+        if draw < self.bad_gateway_rate + self.error_rate:
+            return self.record('page_error', 200, PAGE_ERROR)
+
+        html = archive_get(url, self.source)
+        if html is None:
+            # CricInfo answers unknown webpages with a Page error
+            return self.record('missing', 404, PAGE_ERROR)
+        return self.record('served', 200, html)
+
+    def record(self, outcome, status, html, headers=None):
+        """
+        Count the outcome of a request, and return the response
+        """
+        with self.lock:
+            self.counts[outcome] += 1
+            self.bytes += len(html)
+        if headers is None:
+            headers = {}
+        return status, html, headers
+
+    def stats(self):
+        """
+        Return the number of requests of every outcome and the bytes served so far
+        """
+        with self.lock:
+            return dict(self.counts, requests=sum(self.counts.values()), bytes=self.bytes)
+
+    def start(self):
+        """
+        Serve requests in the background
+        """
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop serving requests and close the socket
+        """
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--source', default=ARCHIVE_PATH, help='archive the webpages are served from')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds every response is delayed by')
+    parser.add_argument('--jitter', type=float, default=0.0, help='up to this many more seconds of random delay')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of "Page error" responses')
+    parser.add_argument('--bad-gateway-rate', type=float, default=0.0, help='share of 502 Bad Gateway responses')
+    parser.add_argument('--rate-limit', type=float, default=None, help='requests per second per host before 429s')
+    parser.add_argument('--burst', type=int, default=1, help='requests allowed back-to-back before the rate limit applies')
+    parser.add_argument('--seed', type=int, default=None, help='seed of the random delays and faults')
+    args = parser.parse_args()
+
+    server = ReplayServer(args.source, args.host, args.port, args.latency, args.jitter, args.error_rate,
+                          args.bad_gateway_rate, args.rate_limit, args.burst, args.seed)
+    print('Replaying', args.source, 'at', server.url, '- set HTTP_PROXY=' + server.url, 'to scrape it, Ctrl+C to stop')
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(server.stats())
+
+if __name__ == "__main__":
+    main()
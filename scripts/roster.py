@@ -0,0 +1,228 @@
+"""
+This script holds match rosters as integers instead of strings. Every player is interned once in a
+registry under the ID of their CricInfo URL (e.g. 28081 for .../ci/content/player/28081.html), and
+the rosters of all matches become a single (matches x 2 teams x 12 players) int32 array, with MISSING
+in the slots of the players a team did not have.
+
+Player details are then laid out one row per registered player, with an extra empty last row, and the
+details of every slot of every match are gathered in one go by indexing that table with the rosters:
+MISSING (-1) lands on the empty row, so missing players need no special handling.
+
+Dependencies: argparse, numpy and pandas
+
+Usage: python roster.py (saving the rosters of matches_scorecard_details to ../data/rosters.npz)
+"""
+
+import argparse
+import sys
+import numpy as np
+import pandas as pd
+
+from storage import read_table, table_path
+
+MISSING = -1
+PLAYER_URL = r'/player/(\d+)\.html'
+TEAMS = 2
+SQUAD = 12
+
+def slot_columns(suffix):
+    """
+    Return the column of every player slot of the matches scorecard, team by team, e.g. team_1_player_1_url
+    """
+    return ['team_' + str(team) + '_player_' + str(player) + suffix for team in range(1, TEAMS+1) for player in range(1, SQUAD+1)]
+
+def player_ids(urls):
+    """
+    Given player URLs, return the CricInfo ID of each
+
+    Keywords:
+        urls: (list) player URLs, with or without the domain
+
+    Return
+        ids: (numpy.ndarray) int32 IDs, MISSING where there is no player
+    """
+    # Every player appears in many matches, so only the distinct URLs are parsed
+    codes, uniques = pd.factorize(np.asarray(urls, dtype=object))
+    ids = pd.Series(np.asarray(uniques, dtype=object), dtype=object).str.extract(PLAYER_URL, expand=False)
+    ids = np.append(ids.fillna(MISSING).astype(np.int32).to_numpy(), np.int32(MISSING))
+
+    return ids[codes]
+
+class PlayerRegistry:
+    """
+    Sorted IDs of every player seen, with the name and URL each was first seen with
+    """
+
+    def __init__(self):
+        self.ids = np.empty(0, dtype=np.int32)
+        self.names = {}
+        self.urls = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def player_urls(self):
+        """
+        Return the URL of every registered player, in the order of the registry
+        """
+        return [self.urls[int(player_id)] for player_id in self.ids]
+
+    def intern(self, urls, names=None):
+        """
+        Given player URLs (and names), register the players not seen yet
+
+        Keywords:
+            urls: (list) player URLs
+            names: (list) player names, same length as urls
+
+        Return
+            ids: (numpy.ndarray) int32 ID of every URL, MISSING where there is no player
+        """
+        ids = player_ids(urls)
+        players = pd.DataFrame({'id': ids, 'url': np.asarray(urls, dtype=object),
+                                'name': np.asarray(urls if names is None else names, dtype=object)})
+        players = players[players['id'] != MISSING].drop_duplicates('id')
+        players = players[~players['id'].isin(self.ids)]
+
+        self.ids = np.union1d(self.ids, players['id'].to_numpy()).astype(np.int32)
+        for player_id, url, name in zip(players['id'], players['url'], players['name']):
+            self.urls[int(player_id)] = url
+            self.names[int(player_id)] = None if names is None else name
+
+        return ids
+
+    def codes(self, ids):
+        """
+        Given IDs, return the row of each in the tables of details_table, MISSING for unregistered players
+        """
+        ids = np.asarray(ids)
+        if len(self.ids) == 0:
+            return np.full(ids.shape, MISSING, dtype=np.int32)
+        codes = np.minimum(np.searchsorted(self.ids, ids), len(self.ids) - 1)
+        return np.where((ids != MISSING) & (self.ids[codes] == ids), codes, MISSING).astype(np.int32)
+
+    def details_table(self, details, columns=None):
+        """
+        Given player details indexed by URL, lay them out one row per registered player
+
+        Keywords:
+            details: (pandas.Dataframe) player details indexed by URL, e.g. the player profiles of data.py
+            columns: (list) columns to keep, all by default
+
+        Return
+            table: (pandas.Dataframe) one row per player in the order of the registry, then an empty row for MISSING
+        """
+        table = details if columns is None else details[columns]
+        table = table.set_axis(player_ids(details.index), axis=0)
+        table = table[~table.index.duplicated()]
+
+        return table.reindex(np.append(self.ids, MISSING)).reset_index(drop=True)
+
+def roster_array(matches_scorecard, registry):
+    """
+    Given the matches scorecard, intern its players and return its rosters
+
+    Keywords:
+        matches_scorecard: (pandas.Dataframe) matches with the 24 player name and URL columns
+        registry: (PlayerRegistry) registry the players are interned in
+
+    Return
+        rosters: (numpy.ndarray) matches x 2 x 12 int32 array of player IDs, MISSING in empty slots
+    """
+    urls = matches_scorecard[slot_columns('_url')].to_numpy(dtype=object)
+    names = matches_scorecard[slot_columns('_name')].to_numpy(dtype=object)
+    ids = registry.intern(urls.ravel(), names.ravel())
+
+    return ids.reshape(len(matches_scorecard), TEAMS, SQUAD)
+
+def roster_columns(rosters, registry, index=None):
+    """
+    Given rosters, return the 24 player name and URL columns they were built from, every player
+    having the name they were first seen with
+    """
+    urls = np.array([None] + registry.player_urls(), dtype=object)
+    names = np.array([None] + [registry.names[int(player_id)] for player_id in registry.ids], dtype=object)
+    # Row 0 is the missing player
+    codes = registry.codes(rosters).reshape(len(rosters), TEAMS * SQUAD) + 1
+
+    columns = {}
+    for i, slot in enumerate(slot_columns('')):
+        columns[slot + '_name'] = names[codes[:, i]]
+        columns[slot + '_url'] = urls[codes[:, i]]
+
+    return pd.DataFrame(columns, index=index)
+
+def roster_features(rosters, registry, table, columns, index=None):
+    """
+    Given rosters, gather the numeric details of every player slot of every match
+
+    Keywords:
+        rosters: (numpy.ndarray) matches x 2 x 12 player IDs, see roster_array
+        registry: (PlayerRegistry) registry of the players
+        table: (pandas.Dataframe) player details, see PlayerRegistry.details_table
+        columns: (list) numeric details to gather, e.g. ['bat_ave', 'bat_sr']
+        index: (pandas.Index) index of the matches, by default 0 to n-1
+
+    Return
+        features: (pandas.Dataframe) team_<t>_player_<p>_<detail> columns, one row per match
+    """
+    matrix = table[columns].to_numpy(dtype=float)
+    # matches x 2 x 12 x details in one fancy index, MISSING picking the empty last row
+    features = matrix[registry.codes(rosters)].reshape(len(rosters), TEAMS * SQUAD * len(columns))
+
+    return pd.DataFrame(features, columns=[slot + '_' + column for slot in slot_columns('') for column in columns], index=index)
+
+def save_rosters(path, rosters, registry):
+    """
+    Save rosters and the registry of their players to a .npz file
+    """
+    ids = [int(player_id) for player_id in registry.ids]
+    np.savez_compressed(path, rosters=rosters, ids=registry.ids,
+                        names=np.array(['' if registry.names[i] is None else registry.names[i] for i in ids], dtype=str),
+                        urls=np.array([registry.urls[i] for i in ids], dtype=str))
+
+def load_rosters(path):
+    """
+    Load rosters and the registry of their players saved by save_rosters
+
+    Return
+        rosters: (numpy.ndarray) matches x 2 x 12 int32 array of player IDs
+        registry: (PlayerRegistry) registry of the players
+    """
+    with np.load(path) as saved:
+        registry = PlayerRegistry()
+        registry.intern(saved['urls'], [name if name != '' else None for name in saved['names']])
+        return saved['rosters'], registry
+
+def roster_memory(matches_scorecard, rosters, registry):
+    """
+    Compare the memory held by the 48 player name and URL columns against the rosters and their registry
+
+    Return
+        memory: (pandas.Series) bytes of the columns as Python strings, as categoricals, and of the rosters
+    """
+    columns = matches_scorecard[slot_columns('_name') + slot_columns('_url')]
+    # Each player's strings are held once, by the registry
+    registry_bytes = (registry.ids.nbytes + sys.getsizeof(registry.urls) + sys.getsizeof(registry.names)
+                      + sum(sys.getsizeof(value) for value in list(registry.urls.values()) + list(registry.names.values())))
+
+    return pd.Series({'object columns': columns.astype(object).memory_usage(deep=True, index=False).sum(),
+                      'categorical columns': columns.astype('category').memory_usage(deep=True, index=False).sum(),
+                      'int32 rosters': rosters.nbytes,
+                      'int32 rosters and registry': rosters.nbytes + registry_bytes})
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--output', default=table_path('rosters', 'npz'), help='where to save the rosters')
+    args = parser.parse_args()
+
+    matches_scorecard = read_table('matches_scorecard_details', slot_columns('_name') + slot_columns('_url'), typed=False)
+    registry = PlayerRegistry()
+    rosters = roster_array(matches_scorecard, registry)
+    save_rosters(args.output, rosters, registry)
+
+    print('Saved the rosters of', len(rosters), 'matches and', len(registry), 'players to', args.output)
+    print((roster_memory(matches_scorecard, rosters, registry) / 2**20).round(2).to_string(), '(MiB)')
+
+if __name__ == "__main__":
+    main()
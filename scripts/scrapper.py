@@ -8,69 +8,297 @@ Created by: Talha Siddiqui
 import pandas as pd
 import re
 import time
+import random
 import datetime
+import threading
 import requests
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 
-def get_webpage(url):
+from archive import archive_get, archive_put
+from metrics import inc, observe, timer
+
+# Politeness settings shared by every scraping thread
+MAX_WORKERS = 8     # concurrent requests in flight
+HOST_RATE = 2       # requests per second allowed to each host
+HOST_BURST = 4      # requests allowed back-to-back before throttling
+ATTEMPTS = 5        # tries per webpage before giving up
+BACKOFF = 1         # seconds of rest before the first retry, doubled at each attempt
+
+class TokenBucket:
     """
-    Given a URL, return a webpage HTML. If the webpage has been scraped before return archived text, otherwise politely scrape it.
+    Token bucket that throttles requests to a single host
+
+    Keywords:
+        rate: (float) tokens added per second
+        capacity: (int) largest number of tokens kept in the bucket
+    """
+
+    def __init__(self, rate=HOST_RATE, capacity=HOST_BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def try_acquire(self):
+        """
+        Take a token if one is available, without waiting.
+
+        Return
+            wait: (float) 0 if a token was taken, otherwise seconds until one is available
+        """
+
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        """
+        Block until a token is available, then take it.
+        """
+
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                return
+            time.sleep(wait)
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+_local = threading.local()
+
+def get_bucket(url):
+    """
+    Given a URL, return the token bucket of its host.
 
     Keywords:
         url: (str) url of webpage to be scraped
 
     Return
+        bucket: (TokenBucket) rate limiter shared by all requests to the host
+    """
+
+    host = urlparse(url).netloc
+    with _buckets_lock:
+        if host not in _buckets:
+            _buckets[host] = TokenBucket(HOST_RATE, HOST_BURST)
+        return _buckets[host]
+
+def set_politeness(max_workers=MAX_WORKERS, host_rate=HOST_RATE, host_burst=HOST_BURST, attempts=ATTEMPTS, backoff=BACKOFF):
+    """
+    Change the politeness settings of every scraping thread from now on, e.g. to scrape a local replay server
+    (see replay.py) as fast as it allows. Called without arguments, restores the defaults.
+
+    Keywords:
+        max_workers: (int) concurrent requests in flight
+        host_rate: (float) requests per second allowed to each host
+        host_burst: (int) requests allowed back-to-back before throttling
+        attempts: (int) tries per webpage before giving up
+        backoff: (float) seconds of rest before the first retry, doubled at each attempt
+    """
+
+    global MAX_WORKERS, HOST_RATE, HOST_BURST, ATTEMPTS, BACKOFF
+    MAX_WORKERS, HOST_RATE, HOST_BURST, ATTEMPTS, BACKOFF = max_workers, host_rate, host_burst, attempts, backoff
+    with _buckets_lock:
+        _buckets.clear()
+
+def get_session():
+    """
+    Return the HTTP session of the current thread, keeping connections to the webserver alive between requests.
+
+    Return
+        session: (requests.Session) pooled HTTP session
+    """
+
+    if not hasattr(_local, 'session'):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=MAX_WORKERS)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _local.session = session
+    return _local.session
+
+def is_page_error(webpage):
+    """
+    Given a scraped webpage, check if the webserver failed to serve it.
+
+    Keywords:
         webpage: (BeautifulSoup) html parsed text from a webpage
+
+    Return
+        error: (bool) True when the webpage is a Page error or Bad Gateway
     """
 
-    # Distributing archive for efficient retrieval
-    if 'player' in url:
-        archive = pd.read_csv('../data/archive/archive-players.csv', index_col=0)
-    elif 'ground' in url:
-        archive = pd.read_csv('../data/archive/archive-grounds.csv', index_col=0)
-    else:
-        archive = pd.read_csv("../data/archive/archive-matches.csv", index_col=0)
+    return 'Page error' in webpage.text or 'Bad Gateway' in webpage.text
+
+def retry_after(html_request):
+    """
+    Given a response, get the seconds the server asks to wait before the next request with its Retry-After header
+
+    Keywords:
+        html_request: (requests.Response) response of the website
 
+    Return
+        seconds: (float) rest asked for by the server, None when the header is missing or unreadable
+    """
+    value = html_request.headers.get('Retry-After')
+    if value is None:
+        return None
     try:
-        # Explore archive first to avoid excessively hitting the server
-        html = archive.loc[url][0]
-        return BeautifulSoup(html, "html.parser")
-    except KeyError:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    # The header may also be an HTTP date
+    try:
+        until = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if until is None:
+        return None
+    if until.tzinfo is None:
+        until = until.replace(tzinfo=datetime.timezone.utc)
+    return max(0.0, (until - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+def scrape_webpage(url):
+    """
+    Given a URL, politely scrape the webpage from the website, resting as long as the server asks with Retry-After
+    on errors, and backing off exponentially with jitter otherwise.
+
+    Keywords:
+        url: (str) url of webpage to be scraped
+
+    Return
+        webpage: (BeautifulSoup) html parsed text from a webpage, which may still be a Page error after all attempts
+    """
+
+    for attempt in range(ATTEMPTS):
         # Be polite to the webserver
-        time.sleep(.5)
-
-        # Get the webpage from the Website
-        html_request = requests.get(url)
-        webpage = BeautifulSoup(html_request.text, features="lxml")
-        attempts = 1
-
-        # Retry upto 5 times to reread the page
-        while attempts < 5 and ('Page error' in webpage.text or 'Bad Gateway' in webpage.text):
-            # Take a deep breath, and try again. Giving more rest to the server at each attempt
-            time.sleep(attempts)
-            html_request = requests.get(url)
+        with timer('throttle_wait_seconds'):
+            get_bucket(url).acquire()
+        start = time.perf_counter()
+        try:
+            html_request = get_session().get(url, timeout=30)
+            observe('fetch_seconds', time.perf_counter() - start)
+            inc('fetch_responses_total', status=html_request.status_code)
             webpage = BeautifulSoup(html_request.text, features="lxml")
-            attempts += 1
-        
-        # Archive scrapped webpage for future use, but exclude Page Error or 2019 match results
-        if 'Page error' in webpage.text or 'Bad Gateway' in webpage.text:
-            print('Cannot process',url)
-            print('Keep bumping into Page error, buddy! ¯\_(ツ)_/¯')
-        elif 'match_results.html?class=2;id=2019;type=year' in url:
-            print('FYI: 2019 match results will not be archived, because updates are expected.')
+            throttled = html_request.status_code == 429 or html_request.status_code >= 500
+            rest = retry_after(html_request) if throttled else None
+        except requests.RequestException:
+            observe('fetch_seconds', time.perf_counter() - start)
+            inc('fetch_responses_total', status='error')
+            webpage = BeautifulSoup('<p>Page error</p>', features="lxml")
+            throttled = True
+            rest = None
+
+        if not (throttled or is_page_error(webpage)):
             return webpage
-        else:
-            add = pd.DataFrame([[url,webpage]],columns=['url','html'])        
-            add.set_index('url', inplace=True)
-            if 'player' in url:
-                add.to_csv('../data/archive/archive-players.csv', mode='a', header=False)
-            elif 'ground' in url:
-                add.to_csv('../data/archive/archive-grounds.csv', mode='a', header=False)
-            else:
-                add.to_csv('../data/archive/archive-matches.csv', mode='a', header=False)
 
-            return webpage
-        
+        # Take a deep breath, and try again. Giving the server the rest it asked for, or more rest at each attempt
+        if attempt < ATTEMPTS - 1:
+            inc('fetch_retries_total')
+            if rest is None:
+                rest = BACKOFF * 2 ** attempt * random.uniform(.5, 1.5)
+            time.sleep(rest)
+
+    inc('fetch_failures_total')
+    return webpage
+
+def archive_lookup(url):
+    """
+    Given a URL, return the archived HTML of the webpage, counting archive hits and misses.
+
+    Keywords:
+        url: (str) url of webpage
+
+    Return
+        html: (str) archived HTML, or None when the webpage is not archived
+    """
+
+    with timer('archive_lookup_seconds'):
+        html = archive_get(url)
+    inc('archive_lookups_total', result='miss' if html is None else 'hit')
+    return html
+
+def get_webpage(url, refresh=False):
+    """
+    Given a URL, return a webpage HTML. If the webpage has been scraped before return archived text, otherwise politely scrape it.
+
+    Keywords:
+        url: (str) url of webpage to be scraped
+        refresh: (bool) scrape the webpage again even if it has been archived, replacing the archived copy
+
+    Return
+        webpage: (BeautifulSoup) html parsed text from a webpage
+    """
+
+    # Explore archive first to avoid excessively hitting the server
+    html = None if refresh else archive_lookup(url)
+    if html is not None:
+        return BeautifulSoup(html, "html.parser")
+
+    webpage = scrape_webpage(url)
+
+    # Archive scrapped webpage for future use, but exclude Page Error or 2019 match results
+    if is_page_error(webpage):
+        print('Cannot process',url)
+        print('Keep bumping into Page error, buddy! ¯\_(ツ)_/¯')
+    elif 'match_results.html?class=2;id=2019;type=year' in url:
+        print('FYI: 2019 match results will not be archived, because updates are expected.')
+        return webpage
+    else:
+        archive_put(url, webpage)
+        return webpage
+
+def get_html(url, refresh=False):
+    """
+    Given a URL, return the raw HTML of a webpage, from the archive when possible.
+
+    Keywords:
+        url: (str) url of webpage to be scraped
+        refresh: (bool) scrape the webpage again even if it has been archived, replacing the archived copy
+
+    Return
+        html: (str) HTML of the webpage, None if it could not be scraped
+    """
+
+    html = None if refresh else archive_lookup(url)
+    if html is None:
+        # Already missing from the archive, no need for get_webpage to look it up again
+        webpage = get_webpage(url, refresh=True)
+        if webpage is not None:
+            html = str(webpage)
+    return html
+
+def get_webpages(urls, parse=True, refresh=False, max_workers=None):
+    """
+    Given a list of URLs, fetch the webpages concurrently and yield them as they arrive. Archived
+    webpages are read from the archive, the rest are politely scraped within each host's rate limit.
+
+    Keywords:
+        urls: (list) urls of webpages to be scraped, duplicates are fetched once
+        parse: (bool) yield BeautifulSoup objects, otherwise raw HTML strings
+        refresh: (bool) scrape the webpages again even if they have been archived
+        max_workers: (int) number of webpages fetched at the same time, MAX_WORKERS by default
+
+    Return
+        pages: (generator) of (url, webpage) tuples in order of arrival, webpage is None if it could not be scraped
+    """
+
+    fetch = get_webpage if parse else get_html
+    with ThreadPoolExecutor(max_workers=max_workers or MAX_WORKERS) as executor:
+        futures = {executor.submit(fetch, url, refresh): url for url in dict.fromkeys(urls)}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
 
 def get_odi_match_results(soup):
     """
@@ -97,6 +325,20 @@ def get_odi_match_results(soup):
                 except TypeError:
                     continue
             l.append(row)
+
+    return match_results_dataframe(l)
+
+def match_results_dataframe(l):
+    """
+    Given the rows of an ODI match results table, get a dataframe of teams, winner, margin, ground and scorecard.
+
+    Keyword:
+        l: (list) rows of cell texts, each followed by the ground and scorecard URLs it links to
+
+    Return:
+        matches: (Dataframe) With teams, winner, margin, ground, ground URL, match date, scorecard and scorecard URL.
+    """
+
     matches = pd.DataFrame(l, columns=['team_1','team_2','winner','margin','ground','ground_url','match_date','scorecard','scorecard_url'])
 
     # For any ODI's that took more than a day to finish,
@@ -161,32 +403,90 @@ def get_scorecard_details(soup):
 
     return details
 
-def get_player_details(soup, match_date):
+def scorecard_number(text):
     """
-    Given a BeautifulSoup object of an ODI cricket player, get the relevant batting and bowling details including age on date of the match in days.
+    Given the text of a scorecard cell, return its number, None for '-' or blank cells
+    """
+    try:
+        return float(text.strip())
+    except ValueError:
+        return None
+
+def overs_to_balls(overs):
+    """
+    Given overs as written on a scorecard, e.g. 9.3, return the number of balls bowled, e.g. 57
+    """
+    if overs is None:
+        return None
+    return int(overs) * 6 + int(round((overs - int(overs)) * 10))
+
+def is_dismissed(commentary):
+    """
+    Given the dismissal text of a batsman, check if they were out
+    """
+    return not ('not out' in commentary or 'retired' in commentary or 'absent' in commentary)
+
+def get_scorecard_stats(soup):
+    """
+    Given a BeautifulSoup object of ODI match scorecard, get the batting and bowling figures of every player
 
     Keyword:
-        soup: (BeautifulSoup) ODI cricket player
-        match_date: (str) ODI cricket match date
+        soup: (BeautifulSoup) ODI match scorecard
 
     Return:
-        details: (list) batting and bowling details including Date of Birth.
+        stats: (list) of [player url, 'bat', runs, balls faced, dismissed] and [player url, 'bowl', runs conceded, balls bowled, wickets]
     """
 
-    # Standardize match_date to datetime for difference calculation later
-    if len(match_date) == 19: md = datetime.datetime.strptime(match_date, "%Y-%m-%d %H:%M:%S")
-    if len(match_date) == 10: md = datetime.datetime.strptime(match_date, "%Y-%m-%d")
+    stats = []
+    for li in soup.find_all('li', {"class": "accordion-item"}):
+        for div in li.find_all('div', {"class":"scorecard-section batsmen"}):
+            for row in div.find_all('div', {"class":"wrap batsmen"}):
+                cell = row.find('div', {"class":"cell batsmen"})
+                a = None if cell is None else cell.find('a')
+                if a is None or 'player' not in a.get('href', ''):
+                    continue
+                runs = [scorecard_number(cell.text) for cell in row.find_all('div', {"class":"cell runs"})]
+                commentary = row.find('div', {"class":"cell commentary"})
+                dismissed = commentary is not None and is_dismissed(commentary.text)
+                if len(runs) > 1:
+                    stats.append([a['href'], 'bat', runs[0], runs[1], int(dismissed)])
+
+        for div in li.find_all('div', {"class":"scorecard-section bowling"}):
+            for table in div.find_all('table'):
+                head = [th.text.strip() for th in table.find_all('th')]
+                if not ('O' in head and 'R' in head and 'W' in head):
+                    continue
+                for tr in table.find_all('tr'):
+                    td = tr.find_all('td')
+                    a = tr.find('a')
+                    if a is None or len(td) < len(head) or 'player' not in a.get('href', ''):
+                        continue
+                    figures = [scorecard_number(td[head.index(column)].text) for column in ['R', 'O', 'W']]
+                    stats.append([a['href'], 'bowl', figures[0], overs_to_balls(figures[1]), figures[2]])
+
+    return stats
+
+def get_player_profile(soup):
+    """
+    Given a BeautifulSoup object of an ODI cricket player, get the relevant batting and bowling details
+    that do not change from match to match, including Date of Birth.
+
+    Keyword:
+        soup: (BeautifulSoup) ODI cricket player
+
+    Return:
+        profile: (list) Date of Birth, styles, batting and bowling details.
+    """
 
-    age = None
+    dob = None
     style = None
     batting_style = None
     bowling_style = None
     
     for p in soup.find_all('p', {"class":"ciPlayerinformationtxt"}):
         if p.text[:4] == 'Born':
-            # get player age
+            # get player date of birth
             dob = pd.to_datetime(re.search('\w{3,9}?\s\d{1,2}?,\s\d{4}?', p.text).group(0))
-            age = (md - dob).days
         if p.text[:4] == 'Play':
             # Get player style
             style = p.find('span').text
@@ -197,44 +497,89 @@ def get_player_details(soup, match_date):
             # Get bowling style
             bowling_style = p.find('span').text
     
-    bat = []
-    bowl = []
+    batting = None
+    bowling = None
     for obs, table in enumerate(soup.find_all('table', {"class":"engineTable"})):
+        if obs > 1:
+            break
+        for tr in table.find_all('tr', {"class":"head"}):
+            th = tr.find_all('th')
+            head = [tr.text for tr in th]
+        rows = []
+        for tr in table.find_all('tr'):
+            td = tr.find_all('td')
+            rows.append([tr.text for tr in td])
         if obs == 0: # Batting averages
-            for tr in table.find_all('tr', {"class":"head"}):
-                th = tr.find_all('th')
-                head = [tr.text for tr in th]
-            for tr in table.find_all('tr'):
-                td = tr.find_all('td')
-                row = [tr.text for tr in td]
-                bat.append(row)
-            # Consolidate HTML table to Pandas Dataframe
-            batting = pd.DataFrame(bat, columns=head)
-            batting.set_index("",drop=True,inplace=True)
-            batting.dropna(inplace=True)
-            batting.replace(to_replace='-', value=0, inplace=True)
-
+            batting = stats_table(head, rows)
         elif obs == 1: # Bowling averages
-            for tr in table.find_all('tr', {"class":"head"}):
-                th = tr.find_all('th')
-                head = [tr.text for tr in th]
-            for tr in table.find_all('tr'):
-                td = tr.find_all('td')
-                row = [tr.text for tr in td]
-                bowl.append(row)
-            # Consolidate HTML table to Pandas Dataframe
-            bowling = pd.DataFrame(bowl, columns=head)
-            bowling.set_index("",drop=True,inplace=True)
-            bowling.dropna(inplace=True)
-            bowling.replace(to_replace='-', value=0, inplace=True)
-                
+            bowling = stats_table(head, rows)
+
+    bat_ave, bat_sr, bowl_ave, bowl_econ, bowl_sr = odi_figures(batting, bowling)
+    
+    profile = [dob, style, batting_style, bowling_style, bat_ave, bat_sr, bowl_ave, bowl_econ, bowl_sr]
+
+
+    return profile
+
+def stats_table(head, rows):
+    """
+    Consolidate an HTML table of career averages to a Pandas Dataframe indexed by format.
+
+    Keyword:
+        head: (list) column headers of the table
+        rows: (list) cell texts of every row of the table
+
+    Return:
+        table: (Dataframe) career averages with missing figures as 0
+    """
+
+    table = pd.DataFrame(rows, columns=head)
+    table.set_index("",drop=True,inplace=True)
+    table.dropna(inplace=True)
+    table.replace(to_replace='-', value=0, inplace=True)
+
+    return table
+
+def odi_figures(batting, bowling):
+    """
+    Given the batting and bowling career averages tables of a player, get the ODI figures.
+
+    Keyword:
+        batting: (Dataframe) batting career averages
+        bowling: (Dataframe) bowling career averages
+
+    Return:
+        figures: (tuple) batting average and strike rate, bowling average, economy and strike rate
+    """
+
     bat_ave = float(batting.loc['ODIs','Ave']) 
     bat_sr = float(batting.loc['ODIs','SR'])
     bowl_ave = float(bowling.loc['ODIs','Ave'])
     bowl_econ = float(bowling.loc['ODIs','Econ'])
     bowl_sr = float(bowling.loc['ODIs','SR'])
-    
-    details = [age, style, batting_style, bowling_style, bat_ave, bat_sr, bowl_ave, bowl_econ, bowl_sr]
+
+    return bat_ave, bat_sr, bowl_ave, bowl_econ, bowl_sr
+
+def get_player_details(soup, match_date):
+    """
+    Given a BeautifulSoup object of an ODI cricket player, get the relevant batting and bowling details including age on date of the match in days.
+
+    Keyword:
+        soup: (BeautifulSoup) ODI cricket player
+        match_date: (str) ODI cricket match date
+
+    Return:
+        details: (list) batting and bowling details including Date of Birth.
+    """
+
+    # Standardize match_date to datetime for difference calculation later
+    if len(match_date) == 19: md = datetime.datetime.strptime(match_date, "%Y-%m-%d %H:%M:%S")
+    if len(match_date) == 10: md = datetime.datetime.strptime(match_date, "%Y-%m-%d")
+
+    profile = get_player_profile(soup)
+    dob = profile[0]
+    age = None if dob is None else (md - dob).days
+    details = [age] + profile[1:]
 
 
     return details
\ No newline at end of file
@@ -0,0 +1,164 @@
+"""
+This script simulates the 2019 ICC Cricket World Cup many times over to estimate each team's chances
+of making the semi-finals and lifting the trophy. The win probability of every fixture is computed
+once by predict.py, then whole batches of tournaments are drawn at once with NumPy across processes.
+
+Dependencies: argparse, numpy, pandas and sklearn
+
+Usage: python simulate.py --simulations 1000000
+"""
+
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+from predict import MatchPredictor, MODEL_PATH
+
+WORLD_CUP_2019 = ['England', 'India', 'Australia', 'New Zealand', 'Pakistan',
+                  'South Africa', 'Sri Lanka', 'West Indies', 'Bangladesh', 'Afghanistan']
+
+def fixture_probabilities(predictor, teams=WORLD_CUP_2019):
+    """
+    Given a predictor, get the probabilities of every fixture between the teams, computed once for all simulations
+
+    Keywords:
+        predictor: (predict.MatchPredictor) model scoring fixtures from the teams' squads
+        teams: (list) teams of the tournament
+
+    Return
+        win: (numpy.ndarray) teams x teams array, probability of the row team beating the column team
+        tied: (numpy.ndarray) teams x teams array, probability of the fixture being tied
+    """
+    predictions = predictor.predict(itertools.permutations(teams, 2))
+    index = {team: i for i, team in enumerate(teams)}
+    first = predictions['team_1'].map(index).to_numpy()
+    second = predictions['team_2'].map(index).to_numpy()
+
+    win = np.zeros((len(teams), len(teams)))
+    tied = np.zeros((len(teams), len(teams)))
+    win[first, second] = predictions['team_1_win'].to_numpy()
+    tied[first, second] = predictions['tied'].to_numpy()
+
+    return win, tied
+
+def simulate_batch(win, tied, simulations, seed):
+    """
+    Simulate a batch of tournaments: a round robin, semi-finals between the 1st and 4th and the 2nd and 3rd,
+    and a final. Ties earn a point each in the round robin and are decided by a coin toss in the knockouts.
+    Teams level on points are separated by wins, then at random as net run rate is not simulated.
+
+    Keywords:
+        win: (numpy.ndarray) probability of the row team beating the column team
+        tied: (numpy.ndarray) probability of the fixture being tied
+        simulations: (int) number of tournaments in the batch
+        seed: (numpy.random.SeedSequence) seed of the batch
+
+    Return
+        counts: (dict) per team counts of titles, finals and semi-finals, and of points (teams x possible points)
+    """
+    rng = np.random.default_rng(seed)
+    n = len(win)
+    rows = np.arange(simulations)[:, None]
+    first, second = np.triu_indices(n, k=1)
+
+    # Round robin: every fixture of every tournament drawn at once
+    draws = rng.random((simulations, len(first)))
+    first_wins = draws < win[first, second]
+    ties = ~first_wins & (draws < win[first, second] + tied[first, second])
+    second_wins = ~first_wins & ~ties
+
+    wins = np.zeros((simulations, n), dtype=np.int32)
+    points = np.zeros((simulations, n), dtype=np.int32)
+    for team in range(n):
+        wins[:, team] = first_wins[:, first == team].sum(axis=1) + second_wins[:, second == team].sum(axis=1)
+        points[:, team] = 2 * wins[:, team] + ties[:, (first == team) | (second == team)].sum(axis=1)
+
+    ranking = points * 100 + wins + rng.random((simulations, n))
+    standings = np.argsort(-ranking, axis=1)
+
+    # Knockouts: a tie goes either way, which keeps the probabilities of a fixture summing to one
+    knockout = win + tied / 2
+
+    def play(a, b):
+        return np.where(rng.random(simulations) < knockout[a, b], a, b)
+
+    finalist_1 = play(standings[:, 0], standings[:, 3])
+    finalist_2 = play(standings[:, 1], standings[:, 2])
+    champion = play(finalist_1, finalist_2)
+
+    return {'title': np.bincount(champion, minlength=n),
+            'final': np.bincount(finalist_1, minlength=n) + np.bincount(finalist_2, minlength=n),
+            'semi_final': np.bincount(standings[:, :4].ravel(), minlength=n),
+            'points': np.stack([np.bincount(points[:, team], minlength=2*(n-1)+1) for team in range(n)])}
+
+def simulate_tournaments(win, tied, teams=WORLD_CUP_2019, simulations=100000, batch_size=50000, workers=None, seed=None):
+    """
+    Simulate the tournament in batches spread over worker processes
+
+    Keywords:
+        win: (numpy.ndarray) probability of the row team beating the column team
+        tied: (numpy.ndarray) probability of the fixture being tied
+        teams: (list) teams of the tournament, in the order of the probability arrays
+        simulations: (int) number of tournaments
+        batch_size: (int) number of tournaments drawn at once by a worker
+        workers: (int) number of worker processes, all CPUs when None and serially when 1
+        seed: (int) seed making the simulations reproducible, for any number of workers
+
+    Return
+        summary: (pandas.Dataframe) per team probability of reaching the semi-finals, the final and winning the title
+        points: (pandas.Dataframe) per team distribution of round robin points
+    """
+    sizes = [batch_size] * (simulations // batch_size)
+    if simulations % batch_size > 0:
+        sizes.append(simulations % batch_size)
+    # Independent streams per batch, so results only depend on the seed and the batch size
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    batches = [(win, tied, size, batch_seed) for size, batch_seed in zip(sizes, seeds)]
+    if workers == 1:
+        results = [simulate_batch(*batch) for batch in batches]
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            results = list(pool.map(simulate_batch, *zip(*batches)))
+
+    counts = {key: sum(result[key] for result in results) for key in results[0]}
+    summary = pd.DataFrame({'semi_final': counts['semi_final'], 'final': counts['final'],
+                            'title': counts['title']}, index=pd.Index(teams, name='team')) / simulations
+    points = pd.DataFrame(counts['points'] / simulations, index=pd.Index(teams, name='team'))
+    points.columns.name = 'points'
+
+    summary = summary.sort_values('title', ascending=False)
+
+    return summary, points.loc[summary.index]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('teams', nargs='*', default=WORLD_CUP_2019, help='teams of the round robin, the 2019 World Cup by default')
+    parser.add_argument('--simulations', type=int, default=100000, help='number of tournaments to simulate')
+    parser.add_argument('--batch-size', type=int, default=50000, help='tournaments drawn at once by a worker')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: all CPUs)')
+    parser.add_argument('--seed', type=int, default=None, help='seed for reproducible simulations')
+    parser.add_argument('--model', default=MODEL_PATH, help='model serialized by predict.save_model')
+    args = parser.parse_args()
+
+    predictor = MatchPredictor(args.model)
+    win, tied = fixture_probabilities(predictor, args.teams)
+
+    start = time.perf_counter()
+    summary, points = simulate_tournaments(win, tied, args.teams, args.simulations, args.batch_size, args.workers, args.seed)
+    elapsed = time.perf_counter() - start
+
+    print(summary.round(4).to_string())
+    print()
+    print('Round robin points:')
+    print(points.round(4).to_string())
+    print()
+    print('Simulated', args.simulations, 'tournaments in', round(elapsed, 2), 's,',
+          int(args.simulations / elapsed), 'tournaments/sec on', args.workers or os.cpu_count(), 'workers')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+This script reads and writes the data files produced by data.py, either as CSV or as typed,
+columnar Parquet files with an explicit schema: categorical teams, grounds, names, URLs and
+styles, float32 statistics and datetime match dates.
+
+Dependencies: pandas, and pyarrow for the Parquet format
+"""
+
+import os
+import pandas as pd
+
+from metrics import timer
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+DATA_DIR = '../data/'
+FORMATS = ['csv', 'parquet']
+OUTPUTS = ['match_results', 'matches_scorecard_details', 'matches_scorecard_player_details', 'complete_player_details']
+
+CATEGORICAL_COLUMNS = ['team1', 'team2', 'team_1', 'team_2', 'team', 'winner', 'margin', 'ground', 'ground_url', 'name', 'url']
+CATEGORICAL_SUFFIXES = ('_name', '_url', 'style')
+STAT_SUFFIXES = ('age', 'bat_ave', 'bat_sr', 'bowl_ave', 'bowl_econ', 'bowl_sr')
+
+def column_dtype(column):
+    """
+    Given a column name of any data file, return the dtype it is stored as
+
+    Keywords:
+        column: (str) column name
+
+    Return
+        dtype: (str) 'datetime64[ns]', 'category' or 'float32', None for columns left as they are
+    """
+    if column == 'match_date':
+        return 'datetime64[ns]'
+    if column in ['scorecard_url']:
+        return None
+    if column in CATEGORICAL_COLUMNS or column.endswith(CATEGORICAL_SUFFIXES):
+        return 'category'
+    if column == 'attendance' or column.endswith(STAT_SUFFIXES):
+        return 'float32'
+    return None
+
+def apply_schema(df):
+    """
+    Casting every column of a data file to the dtype of the schema
+
+    Keywords:
+        df: (pandas.Dataframe) any of the data files
+
+    Return
+        df: (pandas.Dataframe) same table with typed columns
+    """
+    dtypes = {column: column_dtype(column) for column in df.columns if column_dtype(column) is not None}
+    for column, dtype in dtypes.items():
+        if dtype == 'datetime64[ns]':
+            df[column] = pd.to_datetime(df[column])
+        elif dtype == 'category':
+            df[column] = df[column].astype('object').astype('category')
+        else:
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype(dtype)
+
+    return df
+
+def stat_columns(columns):
+    """
+    Given the columns of a data file, keep the player statistics used for modelling
+
+    Keywords:
+        columns: (list) column names
+
+    Return
+        columns: (list) batting and bowling statistics columns
+    """
+    return [c for c in columns if c.endswith(('bat_ave', 'bat_sr', 'bowl_ave', 'bowl_econ', 'bowl_sr'))]
+
+def table_path(name, file_format='csv'):
+    """
+    Return the path of a data file in the given format
+    """
+    return os.path.join(DATA_DIR, name + '.' + file_format)
+
+def table_exists(name, file_format='csv'):
+    """
+    Check if a data file has been saved in the given format
+    """
+    return os.path.exists(table_path(name, file_format))
+
+def require_parquet():
+    """
+    Fail early with a helpful message when pyarrow is missing
+    """
+    if pyarrow is None:
+        raise ImportError('The parquet format requires pyarrow, try: pip install pyarrow')
+
+def write_table(df, name, file_format='csv', append=False):
+    """
+    Saving a data file in the given format
+
+    Keywords:
+        df: (pandas.Dataframe) table to save
+        name: (str) name of the data file, e.g. 'match_results'
+        file_format: (str) 'csv' or 'parquet'
+        append: (bool) adding the rows to the saved data file instead of replacing it
+    """
+    path = table_path(name, file_format)
+    with timer('write_seconds', table=name, file_format=file_format):
+        if file_format == 'csv':
+            if append == True:
+                df.to_csv(path, mode='a', header=False, index=False)
+            else:
+                df.to_csv(path, index=False)
+            return
+
+        require_parquet()
+        if append == True and os.path.exists(path):
+            df = pd.concat([pd.read_parquet(path), df], ignore_index=True, sort=False)
+        apply_schema(df.reset_index(drop=True)).to_parquet(path, index=False)
+
+def table_columns(name, file_format=None):
+    """
+    Return the column names of a data file without loading it
+
+    Keywords:
+        name: (str) name of the data file, e.g. 'match_results'
+        file_format: (str) 'csv' or 'parquet', by default the Parquet file when there is one
+
+    Return
+        columns: (list) column names
+    """
+    if file_format is None:
+        file_format = 'parquet' if os.path.exists(table_path(name, 'parquet')) else 'csv'
+
+    path = table_path(name, file_format)
+    if file_format == 'parquet':
+        require_parquet()
+        return pyarrow.parquet.read_schema(path).names
+
+    return list(pd.read_csv(path, nrows=0).columns)
+
+def read_table(name, columns=None, file_format=None, typed=True):
+    """
+    Loading a data file, only reading the columns asked for
+
+    Keywords:
+        name: (str) name of the data file, e.g. 'match_results'
+        columns: (list) columns to load, all of them when None
+        file_format: (str) 'csv' or 'parquet', by default the Parquet file when there is one
+        typed: (bool) casting CSV columns to the dtypes of the schema, Parquet files are always typed
+
+    Return
+        df: (pandas.Dataframe) the data file
+    """
+    if file_format is None:
+        file_format = 'parquet' if os.path.exists(table_path(name, 'parquet')) else 'csv'
+
+    path = table_path(name, file_format)
+    if file_format == 'parquet':
+        require_parquet()
+        return pd.read_parquet(path, columns=columns)
+
+    df = pd.read_csv(path, usecols=columns)
+    if columns is not None:
+        df = df[columns]
+    if typed == True:
+        df = apply_schema(df)
+
+    return df
@@ -0,0 +1,226 @@
+"""
+This script trains the classifiers of notebooks/ML_predictions.ipynb outside the notebook. The feature
+matrix is built once from matches_scorecard_player_details and cached, matches are split by date so
+models are always validated on matches played after the ones they learnt from, and the hyperparameter
+search runs in parallel, optionally with successive halving. The best model is saved for predict.py.
+
+Dependencies: argparse, numpy, pandas and sklearn
+
+Usage: python train.py
+       python train.py rfc --search halving --jobs 4
+"""
+
+import argparse
+import os
+import pickle
+import time
+import warnings
+from functools import partial
+import numpy as np
+import pandas as pd
+
+from sklearn.svm import SVC
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.neural_network import MLPClassifier
+from sklearn.preprocessing import StandardScaler
+from sklearn.exceptions import ConvergenceWarning
+from sklearn.model_selection import GridSearchCV, TimeSeriesSplit
+from sklearn.experimental import enable_halving_search_cv
+from sklearn.model_selection import HalvingGridSearchCV
+
+from predict import save_model, MODEL_PATH
+from storage import read_table, table_columns, table_exists, table_path, stat_columns
+
+FEATURES_PATH = '../data/features.pkl'
+SEARCHES = ['grid', 'halving']
+
+# Same models and grids as the notebook, SVC estimating probabilities for predict.py and simulate.py
+MODELS = {
+    'rfc': (RandomForestClassifier, {'n_estimators' : [10, 50, 100],
+                                     'criterion' : ['gini', 'entropy'],
+                                     'max_depth' : [10, 50, 100],
+                                     'min_samples_split': [2, 5, 20]}),
+    'mlp': (MLPClassifier, {'hidden_layer_sizes' : [(50,), (10,), (10,10)],
+                            'learning_rate_init' : [1e-4, 1e-3, 1e-2],
+                            'alpha' : [1e-5, 1e-4, 1e-3],
+                            'activation' : ['relu', 'tanh']}),
+    'svc': (partial(SVC, probability=True), {'C' : [0.001, 0.01, 0.1, 1, 10],
+                                             'kernel' : ['rbf', 'poly', 'sigmoid', 'linear'],
+                                             'gamma' : [0.001, 0.01, 0.1, 1]}),
+}
+
+def match_outcome(data):
+    """
+    Turns match winner into Team 1 or Team 2 or Tied
+
+    Keywords:
+        data: (pandas.Dataframe) matches with team_1, team_2 and winner columns
+
+    Return
+        y: (numpy.ndarray) 'team_1', 'team_2' or 'tied' for every match
+    """
+    return np.select([data['team_1'] == data['winner'], data['team_2'] == data['winner']],
+                     ['team_1', 'team_2'], 'tied')
+
+def feature_matrix(cache_path=FEATURES_PATH, refresh=False):
+    """
+    Load the batting and bowling statistics of every match in chronological order, along with the outcome.
+    The matrix is cached and only rebuilt when matches_scorecard_player_details has been saved since.
+
+    Keywords:
+        cache_path: (str) location of the cached feature matrix, None to always rebuild it
+        refresh: (bool) rebuilding the feature matrix even if it is cached
+
+    Return
+        X: (pandas.Dataframe) batting and bowling statistics of every player slot of both teams
+        y: (numpy.ndarray) outcome of every match
+        match_date: (pandas.Series) date of every match
+    """
+    name = 'matches_scorecard_player_details'
+    file_format = 'parquet' if table_exists(name, 'parquet') else 'csv'
+    source = table_path(name, file_format)
+    mtime = os.path.getmtime(source)
+
+    if cache_path is not None and refresh == False and os.path.exists(cache_path):
+        with open(cache_path, 'rb') as f:
+            cache = pickle.load(f)
+        if cache['source'] == source and cache['mtime'] == mtime:
+            return cache['X'], cache['y'], cache['match_date']
+
+    # Only the statistics, teams, winner and date are read instead of every column
+    stats = stat_columns(table_columns(name, file_format))
+    data = read_table(name, ['team_1', 'team_2', 'winner', 'match_date'] + stats, file_format)
+    data = data.sort_values('match_date', kind='mergesort').reset_index(drop=True)
+
+    X = data[stats].astype('float64')
+    y = match_outcome(data.astype({'team_1': object, 'team_2': object, 'winner': object}))
+    match_date = data['match_date']
+
+    if cache_path is not None:
+        with open(cache_path, 'wb') as f:
+            pickle.dump({'source': source, 'mtime': mtime, 'X': X, 'y': y, 'match_date': match_date}, f)
+
+    return X, y, match_date
+
+def chronological_split(X, y, test_size=0.25):
+    """
+    Hold out the most recent matches for testing instead of a random sample, X being in chronological order
+
+    Return
+        X_train, X_test, y_train, y_test: same as sklearn.model_selection.train_test_split
+    """
+    split = int(len(X) * (1 - test_size))
+    return X.iloc[:split], X.iloc[split:], y[:split], y[split:]
+
+def search_model(name, X_train, y_train, search='grid', n_jobs=-1, n_splits=5):
+    """
+    Search the hyperparameters of a model over time ordered folds, every fold validating on later matches
+
+    Keywords:
+        name: (str) model of MODELS, 'rfc', 'mlp' or 'svc'
+        X_train: (numpy.ndarray) scaled training features in chronological order
+        y_train: (numpy.ndarray) training outcomes
+        search: (str) 'grid' for an exhaustive search, 'halving' for successive halving
+        n_jobs: (int) number of parallel fits, all CPUs when -1
+        n_splits: (int) number of time ordered folds
+
+    Return
+        gridsearch: (sklearn.model_selection.GridSearchCV or HalvingGridSearchCV) fitted search
+        timings: (pandas.Dataframe) fit and score time of every configuration, slowest first. Successive halving
+                 fits configurations again at every iteration, one row per configuration and iteration
+    """
+    estimator, param_grid = MODELS[name]
+    cv = TimeSeriesSplit(n_splits=n_splits)
+    if search == 'halving':
+        gridsearch = HalvingGridSearchCV(estimator=estimator(), param_grid=param_grid, cv=cv, n_jobs=n_jobs)
+    else:
+        gridsearch = GridSearchCV(estimator=estimator(), param_grid=param_grid, cv=cv, n_jobs=n_jobs)
+
+    gridsearch.fit(X_train, y_train)
+
+    results = pd.DataFrame(gridsearch.cv_results_)
+    timings = pd.DataFrame({'params': results['params'].astype(str),
+                            'fit_time': results['mean_fit_time'] * n_splits,
+                            'score_time': results['mean_score_time'] * n_splits,
+                            'score': results['mean_test_score']})
+    if 'iter' in results:
+        timings['iteration'] = results['iter']
+        timings['n_resources'] = results['n_resources']
+
+    return gridsearch, timings.sort_values('fit_time', ascending=False).reset_index(drop=True)
+
+def train_models(names=list(MODELS), search='grid', n_jobs=-1, n_splits=5, test_size=0.25, model_path=MODEL_PATH,
+                 cache_path=FEATURES_PATH, refresh=False):
+    """
+    Search every model, then save the one with the best cross-validated accuracy for predict.py
+
+    Keywords:
+        names: (list) models of MODELS to train
+        search: (str) 'grid' or 'halving'
+        n_jobs: (int) number of parallel fits, all CPUs when -1
+        n_splits: (int) number of time ordered folds
+        test_size: (float) share of the most recent matches held out for testing
+        model_path: (str) location of the saved model, None to not save it
+        cache_path: (str) location of the cached feature matrix
+        refresh: (bool) rebuilding the feature matrix even if it is cached
+
+    Return
+        summary: (pandas.Dataframe) best parameters, accuracies and search time of every model
+        timings: (dict) fit and score time of every configuration (and halving iteration) of every model
+    """
+    X, y, match_date = feature_matrix(cache_path, refresh)
+    X_train, X_test, y_train, y_test = chronological_split(X, y, test_size)
+
+    # Scaling once for all searches rather than once per fit
+    scaler_model = StandardScaler().fit(X_train)
+    X_train_scaled = scaler_model.transform(X_train)
+    X_test_scaled = scaler_model.transform(X_test)
+
+    summary = []
+    timings = {}
+    best = None
+    for name in names:
+        start = time.perf_counter()
+        gridsearch, timings[name] = search_model(name, X_train_scaled, y_train, search, n_jobs, n_splits)
+        elapsed = time.perf_counter() - start
+
+        # Successive halving has a row per iteration of a configuration
+        summary.append({'model': name, 'configurations': timings[name]['params'].nunique(), 'search_time': elapsed,
+                        'cv_accuracy': gridsearch.best_score_,
+                        'train_accuracy': gridsearch.score(X_train_scaled, y_train),
+                        'test_accuracy': gridsearch.score(X_test_scaled, y_test),
+                        'best_params': gridsearch.best_params_})
+        if best is None or gridsearch.best_score_ > best.best_score_:
+            best = gridsearch
+
+    if model_path is not None:
+        save_model(scaler_model, best.best_estimator_, X_train, model_path)
+
+    return pd.DataFrame(summary).set_index('model'), timings
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('models', nargs='*', choices=list(MODELS), default=list(MODELS), help='models to train')
+    parser.add_argument('--search', choices=SEARCHES, default='grid', help='exhaustive or successive halving search')
+    parser.add_argument('--jobs', type=int, default=-1, help='parallel fits (default: all CPUs)')
+    parser.add_argument('--splits', type=int, default=5, help='time ordered cross-validation folds')
+    parser.add_argument('--model', default=MODEL_PATH, help='where to save the best model')
+    parser.add_argument('--refresh', action='store_true', help='rebuild the cached feature matrix')
+    args = parser.parse_args()
+
+    # The smaller learning rates of the MLP grid run out of iterations, which is expected
+    warnings.filterwarnings('ignore', category=ConvergenceWarning)
+
+    summary, timings = train_models(args.models, args.search, args.jobs, args.splits, model_path=args.model,
+                                    refresh=args.refresh)
+
+    with pd.option_context('display.max_colwidth', 120, 'display.width', 200):
+        for name, timing in timings.items():
+            print(name, '- time per configuration' + (' and iteration' if 'iteration' in timing else '') + ' (s):')
+            print(timing.round(3).to_string())
+            print()
+        print(summary.round(3).to_string())
+    print('Saved the best model,', summary['cv_accuracy'].idxmax() + ', to', args.model)
+
+if __name__ == "__main__":
+    main()